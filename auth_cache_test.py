@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test for the authentication caches
+Checks TTLCache expiry, LRU eviction and counters directly, then that repeated authenticated requests are served from the JWT and principal caches
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from ttl_cache import TTLCache  # noqa: E402
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+HEADERS = {"Content-Type": "application/json"}
+
+class AuthCacheTest:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.headers = HEADERS.copy()
+        self.token = None
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def test_ttl_cache(self):
+        print("\n=== Testing TTLCache ===")
+        cache = TTLCache(max_size=2, ttl=0.2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.log_result("Cached Value Returned", cache.get("a") == 1 and cache.hits == 1)
+        cache.set("c", 3)
+        self.log_result(
+            "Least Recently Used Entry Evicted",
+            cache.get("b") is None and cache.get("a") == 1 and cache.evictions == 1,
+            f"Stats: {cache.stats()}"
+        )
+        cache = TTLCache(max_size=10, ttl=0.2)
+        cache.set("short", 1, ttl=0.05)
+        cache.set("long", 2)
+        time.sleep(0.1)
+        self.log_result("Entry Expires At Its Own TTL", cache.get("short") is None and cache.get("long") == 2)
+        time.sleep(0.15)
+        self.log_result("Entry Expires At The Cache TTL", cache.get("long") is None)
+        cache.set("popped", 3)
+        cache.pop("popped")
+        self.log_result("Popped Entry Is Gone", cache.get("popped") is None, f"Stats: {cache.stats()}")
+
+    def metrics(self) -> dict:
+        return requests.get(f"{self.base_url}/metrics").json()
+
+    def test_principal_cache(self):
+        print("\n=== Testing the principal cache ===")
+        timestamp = str(int(time.time() * 1000))
+        response = requests.post(f"{self.base_url}/auth/register", headers=self.headers, json={
+            "email": f"cache.{timestamp}@example.com",
+            "name": "Cache User",
+            "phone": f"9{timestamp[-9:]}",
+            "password": "cachetestpass123"
+        })
+        if response.status_code != 200:
+            self.log_result("Register Cache User", False, f"HTTP {response.status_code}")
+            return
+        self.token = response.json()["access_token"]
+        auth = {**self.headers, "Authorization": f"Bearer {self.token}"}
+
+        before_metrics = self.metrics()
+        first = requests.get(f"{self.base_url}/auth/me", headers=auth)
+        for _ in range(4):
+            requests.get(f"{self.base_url}/auth/me", headers=auth)
+        after_metrics = self.metrics()
+        before, after = before_metrics["principal_cache"], after_metrics["principal_cache"]
+        self.log_result(
+            "Repeated Requests Hit The Cache",
+            after["misses"] - before["misses"] <= 1 and after["hits"] - before["hits"] >= 4,
+            f"Hits +{after['hits'] - before['hits']}, misses +{after['misses'] - before['misses']}"
+        )
+        before, after = before_metrics["jwt_cache"], after_metrics["jwt_cache"]
+        self.log_result(
+            "Token Verified Once",
+            after["misses"] - before["misses"] <= 1 and after["hits"] - before["hits"] >= 4,
+            f"Hits +{after['hits'] - before['hits']}, misses +{after['misses'] - before['misses']}"
+        )
+        response = requests.get(f"{self.base_url}/auth/me", headers={**auth, "Authorization": f"Bearer {self.token}x"})
+        self.log_result("Tampered Token Still Rejected", response.status_code == 401, f"HTTP {response.status_code}")
+        self.log_result(
+            "Principal Carries No Password Hash",
+            first.status_code == 200 and "password_hash" not in first.json(),
+            f"Fields: {sorted(first.json())}"
+        )
+
+    def run_all_tests(self):
+        print("🚀 Starting Auth Cache Test")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+        self.test_ttl_cache()
+        self.test_principal_cache()
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = AuthCacheTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test for short-lived access tokens, rotating refresh tokens and session revocation
+"""
+
+import sys
+import time
+
+import requests
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+HEADERS = {"Content-Type": "application/json"}
+# Must match the server's REFRESH_REUSE_GRACE_SECONDS
+REUSE_GRACE_SECONDS = 10
+
+class AuthSessionTest:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.headers = HEADERS.copy()
+        self.credentials = None
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def me(self, access_token: str) -> int:
+        return requests.get(f"{self.base_url}/auth/me", headers={**self.headers, "Authorization": f"Bearer {access_token}"}).status_code
+
+    def refresh(self, refresh_token: str) -> requests.Response:
+        return requests.post(f"{self.base_url}/auth/refresh", headers=self.headers, json={"refresh_token": refresh_token})
+
+    def login(self) -> dict:
+        return requests.post(f"{self.base_url}/auth/login", headers=self.headers, json=self.credentials).json()
+
+    def test_register_issues_tokens(self):
+        print("\n=== Testing token issue ===")
+        timestamp = str(int(time.time() * 1000))
+        self.credentials = {"email": f"session.{timestamp}@example.com", "password": "sessiontestpass123"}
+        response = requests.post(f"{self.base_url}/auth/register", headers=self.headers, json={
+            **self.credentials,
+            "name": "Session User",
+            "phone": f"4{timestamp[-9:]}"
+        })
+        data = response.json()
+        self.log_result(
+            "Register Returns Access And Refresh Tokens",
+            response.status_code == 200 and bool(data.get("refresh_token")) and 0 < data.get("expires_in", 0) <= 3600,
+            f"expires_in: {data.get('expires_in')}"
+        )
+
+    def test_rotation(self):
+        print("\n=== Testing refresh token rotation ===")
+        session = self.login()
+        response = self.refresh(session["refresh_token"])
+        rotated = response.json()
+        self.log_result(
+            "Refresh Issues New Tokens",
+            response.status_code == 200 and rotated["refresh_token"] != session["refresh_token"] and self.me(rotated["access_token"]) == 200,
+            f"HTTP {response.status_code}"
+        )
+        # Two tabs refreshing at the same expiry present the same token moments apart
+        response = self.refresh(session["refresh_token"])
+        self.log_result(
+            "Immediate Reuse Treated As Concurrent Refresh",
+            response.status_code == 200 and self.me(rotated["access_token"]) == 200,
+            f"HTTP {response.status_code}"
+        )
+        time.sleep(REUSE_GRACE_SECONDS + 1)
+        response = self.refresh(session["refresh_token"])
+        self.log_result("Rotated-Out Refresh Token Rejected", response.status_code == 401, f"HTTP {response.status_code}")
+        self.log_result(
+            "Reuse Ends The Session",
+            self.me(rotated["access_token"]) == 401 and self.refresh(rotated["refresh_token"]).status_code == 401
+        )
+        self.log_result("Other Sessions Unaffected", self.me(self.login()["access_token"]) == 200)
+
+    def test_logout(self):
+        print("\n=== Testing logout ===")
+        session = self.login()
+        response = requests.post(f"{self.base_url}/auth/logout", headers={**self.headers, "Authorization": f"Bearer {session['access_token']}"})
+        self.log_result("Logout Succeeds", response.status_code == 200, f"HTTP {response.status_code}")
+        self.log_result("Access Token Revoked", self.me(session["access_token"]) == 401)
+        self.log_result("Refresh Token Revoked", self.refresh(session["refresh_token"]).status_code == 401)
+        self.log_result("Unknown Refresh Token Rejected", self.refresh("not-a-token").status_code == 401)
+
+    def run_all_tests(self):
+        print("🚀 Starting Auth Session Test")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+        self.test_register_issues_tokens()
+        self.test_rotation()
+        self.test_logout()
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = AuthSessionTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
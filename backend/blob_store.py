@@ -0,0 +1,278 @@
+"""
+Content-addressed storage for listing images
+
+Blobs are keyed by the SHA-256 of their bytes, so storing the same image twice
+keeps one copy and a key never changes meaning, which lets clients cache them
+forever. The local backend keeps files on disk; the S3 backend works with AWS
+and S3-compatible servers such as MinIO.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+# Bytes read per chunk when streaming a blob
+CHUNK_SIZE = 64 * 1024
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Content type of an image from its first bytes, or None if it is not a supported image"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+# Bytes kept from the start of a streamed blob to sniff its type
+HEAD_SIZE = 16
+
+class BlobWriter:
+    """Receives one blob in chunks, hashing it on the way, so it is never held in memory whole"""
+
+    def __init__(self):
+        self.size = 0
+        self.head = b""
+        self._sha256 = hashlib.sha256()
+
+    async def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if len(self.head) < HEAD_SIZE:
+            self.head += chunk[:HEAD_SIZE - len(self.head)]
+        self._sha256.update(chunk)
+        await self._write(chunk)
+
+    async def _write(self, chunk: bytes):
+        raise NotImplementedError
+
+    async def commit(self, content_type: str) -> str:
+        """Store what was written and return its digest"""
+        raise NotImplementedError
+
+    async def abort(self):
+        """Discard what was written"""
+        raise NotImplementedError
+
+class BlobStore:
+    """Stores immutable blobs under the hex SHA-256 of their content"""
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        raise NotImplementedError
+
+    async def stat(self, digest: str) -> Optional[dict]:
+        """{"size", "content_type"} of a stored blob, or None if there is no such blob"""
+        raise NotImplementedError
+
+    def stream(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Bytes start..end (inclusive) of a stored blob, in chunks"""
+        raise NotImplementedError
+
+    def writer(self) -> BlobWriter:
+        """A writer for storing a blob that arrives in chunks"""
+        raise NotImplementedError
+
+    async def read(self, digest: str) -> Optional[bytes]:
+        """A whole stored blob, or None if there is no such blob"""
+        info = await self.stat(digest)
+        if info is None:
+            return None
+        return b"".join([chunk async for chunk in self.stream(digest, 0, info["size"] - 1)])
+
+class LocalBlobWriter(BlobWriter):
+    """Spools to a temporary file under the store root, then renames it into place"""
+
+    def __init__(self, store: "LocalBlobStore"):
+        super().__init__()
+        self._store = store
+        self._file = None
+
+    async def _write(self, chunk: bytes):
+        if self._file is None:
+            incoming = self._store.root / ".incoming"
+            await asyncio.to_thread(incoming.mkdir, parents=True, exist_ok=True)
+            self._file = await asyncio.to_thread(tempfile.NamedTemporaryFile, dir=incoming, delete=False)
+        await asyncio.to_thread(self._file.write, chunk)
+
+    def _commit(self, path: Path):
+        self._file.close()
+        if path.exists():
+            os.unlink(self._file.name)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._file.name, path)
+
+    async def commit(self, content_type: str) -> str:
+        digest = self._sha256.hexdigest()
+        if self._file is None:
+            await self._store.put(b"", content_type)
+        else:
+            await asyncio.to_thread(self._commit, self._store._path(digest))
+            self._file = None
+        return digest
+
+    def _abort(self):
+        self._file.close()
+        os.unlink(self._file.name)
+
+    async def abort(self):
+        if self._file is not None:
+            await asyncio.to_thread(self._abort)
+            self._file = None
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under `root`, fanned out by the first two bytes of the digest"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def _write(self, path: Path, data: bytes):
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write aside and rename so readers never see a partial blob
+        temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def _stat(self, path: Path) -> Optional[dict]:
+        try:
+            with open(path, "rb") as f:
+                head = f.read(16)
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return None
+        return {"size": size, "content_type": sniff_image_type(head) or "application/octet-stream"}
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._write, self._path(digest), data)
+        return digest
+
+    async def stat(self, digest: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._stat, self._path(digest))
+
+    def writer(self) -> BlobWriter:
+        return LocalBlobWriter(self)
+
+    async def stream(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, self._path(digest), "rb")
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+class S3BlobWriter(BlobWriter):
+    """Spools to a local temporary file, then uploads it; boto3 sends large files in parts"""
+
+    def __init__(self, store: "S3BlobStore"):
+        super().__init__()
+        self._store = store
+        self._file = None
+
+    async def _write(self, chunk: bytes):
+        if self._file is None:
+            self._file = await asyncio.to_thread(tempfile.TemporaryFile)
+        await asyncio.to_thread(self._file.write, chunk)
+
+    def _upload(self, key: str, content_type: str):
+        self._file.seek(0)
+        self._store._client.upload_fileobj(
+            self._file, self._store.bucket, key, ExtraArgs={"ContentType": content_type}
+        )
+
+    async def commit(self, content_type: str) -> str:
+        digest = self._sha256.hexdigest()
+        if self._file is None:
+            await self._store.put(b"", content_type)
+            return digest
+        try:
+            if await self._store.stat(digest) is None:
+                await asyncio.to_thread(self._upload, self._store._key(digest), content_type)
+        finally:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+        return digest
+
+    async def abort(self):
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+class S3BlobStore(BlobStore):
+    """Blobs as objects in an S3 bucket; boto3 calls run on worker threads"""
+
+    def __init__(self, bucket: str, prefix: str = "images/", endpoint_url: Optional[str] = None):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._client_error = ClientError
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}{digest}"
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if await self.stat(digest) is None:
+            await asyncio.to_thread(
+                self._client.put_object, Bucket=self.bucket, Key=self._key(digest), Body=data, ContentType=content_type
+            )
+        return digest
+
+    async def stat(self, digest: str) -> Optional[dict]:
+        try:
+            head = await asyncio.to_thread(self._client.head_object, Bucket=self.bucket, Key=self._key(digest))
+        except self._client_error as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": head["ContentLength"], "content_type": head.get("ContentType") or "application/octet-stream"}
+
+    def writer(self) -> BlobWriter:
+        return S3BlobWriter(self)
+
+    async def stream(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        # An empty blob has no byte range to ask for ("bytes=0--1" is not a valid Range)
+        if end < start:
+            return
+        response = await asyncio.to_thread(
+            self._client.get_object, Bucket=self.bucket, Key=self._key(digest), Range=f"bytes={start}-{end}"
+        )
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+def create_blob_store(kind: str, path: str, bucket: Optional[str] = None, prefix: str = "images/",
+                      endpoint_url: Optional[str] = None) -> BlobStore:
+    if kind == "local":
+        return LocalBlobStore(path)
+    if kind == "s3":
+        if not bucket:
+            raise ValueError("The s3 blob store needs S3_BUCKET")
+        return S3BlobStore(bucket, prefix, endpoint_url)
+    raise ValueError(f"Unknown blob store: {kind}")
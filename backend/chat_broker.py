@@ -0,0 +1,174 @@
+"""
+Pub/sub brokers that carry chat events between uvicorn workers
+
+Every worker publishes through a broker and receives every message published
+by any worker through its handler, so each worker can deliver events to the
+connections it holds without polling the database.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from typing import Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Largest single event line accepted from the relay
+MAX_MESSAGE_BYTES = 1024 * 1024
+# A worker whose relay buffer grows past this is too slow to keep up and is disconnected
+MAX_PENDING_BYTES = 8 * 1024 * 1024
+
+class ChatBroker:
+    """Delivers every published message to the handler of every worker"""
+
+    def __init__(self):
+        self._handler: Optional[Callable[[dict], None]] = None
+
+    async def start(self, handler: Callable[[dict], None]):
+        self._handler = handler
+
+    async def stop(self):
+        pass
+
+    async def publish(self, message: dict):
+        raise NotImplementedError
+
+class InMemoryBroker(ChatBroker):
+    """Single-process broker: messages go straight to the local handler"""
+
+    async def publish(self, message: dict):
+        self._handler(message)
+
+class UnixSocketBroker(ChatBroker):
+    """Relays messages between the workers of one host over a Unix domain socket.
+
+    Whichever worker holds an flock on `<path>.lock` hosts the relay. Every
+    worker, including the host, connects to the relay as a client. The lock is
+    released when the host process dies, and the remaining workers race to take
+    over. Messages published while a worker is reconnecting only reach that
+    worker's own connections.
+    """
+
+    def __init__(self, path: str, reconnect_delay: float = 0.2):
+        super().__init__()
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._relay_clients: Set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    async def start(self, handler: Callable[[dict], None]):
+        await super().start(handler)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        if self._server is not None:
+            # Closing the client streams lets their relay handlers finish on EOF
+            for client in list(self._relay_clients):
+                client.close()
+            self._server.close()
+            await asyncio.sleep(0)
+        if self._lock_file is not None:
+            self._lock_file.close()
+
+    async def wait_connected(self, timeout: float = 5):
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def publish(self, message: dict):
+        self._handler(message)
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(json.dumps(message).encode() + b"\n")
+            await self._writer.drain()
+        except (ConnectionError, RuntimeError):
+            logger.warning("Chat broker relay unavailable; event delivered locally only")
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await self._connect()
+            except OSError:
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            self._writer = writer
+            self._connected.set()
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    try:
+                        self._handler(json.loads(line))
+                    except Exception:
+                        logger.exception("Chat broker handler failed")
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                pass
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _connect(self):
+        try:
+            return await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+        except (FileNotFoundError, ConnectionRefusedError):
+            # No live relay: host one if no other worker already holds the lock
+            await self._try_host_relay()
+            return await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+
+    async def _try_host_relay(self):
+        if self._server is not None:
+            return
+        lock_file = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return
+        self._lock_file = lock_file
+        if os.path.exists(self.path):
+            # Left behind by a relay host that died
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve_client, self.path, limit=MAX_MESSAGE_BYTES)
+        logger.info("Hosting chat broker relay on %s (pid %d)", self.path, os.getpid())
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._relay_clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # The publisher already delivered locally, so forward to every other worker
+                for client in list(self._relay_clients):
+                    if client is writer:
+                        continue
+                    if client.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                        logger.warning("Dropping a chat broker client that stopped reading")
+                        self._relay_clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._relay_clients.discard(writer)
+            writer.close()
+
+def create_broker(kind: str, socket_path: str) -> ChatBroker:
+    if kind == "memory":
+        return InMemoryBroker()
+    if kind == "unix":
+        return UnixSocketBroker(socket_path)
+    raise ValueError(f"Unknown chat broker: {kind}")
@@ -0,0 +1,73 @@
+"""
+Resized variants of listing images
+
+List cards and chat avatars render small versions of an upload instead of the
+original. `render_variants` decodes and re-encodes images, which is CPU-bound,
+so the backend runs it in a process pool rather than on the event loop; it only
+takes and returns bytes so it can cross the process boundary.
+"""
+
+import io
+from typing import Dict
+
+from PIL import Image, ImageOps
+
+# Longest side, in pixels, of each variant
+VARIANT_SIZES = {
+    "thumb": 160,
+    "card": 480,
+    "full": 1600,
+}
+
+# Larger images are refused before decoding: a decoded image takes about 4 bytes per pixel.
+# Pillow's own limit only warns below twice its default.
+MAX_IMAGE_PIXELS = 40_000_000
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+VARIANT_FORMATS = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+def flatten(image: Image.Image) -> Image.Image:
+    """RGB copy of an image, with any transparency composited onto white"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, **SAVE_OPTIONS[image_format])
+    return buffer.getvalue()
+
+def render_variants(data: bytes) -> Dict[str, Dict[str, bytes]]:
+    """Every size of an image in every format, as {size: {format: bytes}}.
+
+    Images are only ever scaled down, and animated images keep their first frame.
+    Raises ValueError if the data cannot be decoded or has more than MAX_IMAGE_PIXELS.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            # Opening only reads the header, so this is checked before any pixels are decoded
+            width, height = original.size
+            if width * height > MAX_IMAGE_PIXELS:
+                raise ValueError(f"Image is too large to render ({width}x{height} pixels)")
+            image = flatten(ImageOps.exif_transpose(original))
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Cannot decode image: {e}")
+
+    variants = {}
+    # Largest first, so each size is scaled from the one before it
+    for size, pixels in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((pixels, pixels), Image.LANCZOS)
+        variants[size] = {image_format: encode(image, image_format) for image_format in VARIANT_FORMATS}
+    return variants
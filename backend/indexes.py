@@ -0,0 +1,158 @@
+"""
+Declarative registry of the MongoDB indexes the backend relies on
+
+Indexes are matched to what exists in the database by key pattern, so indexes
+built by earlier releases under their default names are recognised. Missing
+indexes are built at startup; rebuilding changed indexes and dropping
+undeclared ones is left to `manage.py check-indexes --fix`.
+
+The backend refuses to start while a declared unique index exists without its
+uniqueness or cannot be built over duplicate values, since it relies on it to
+reject duplicates. Databases from before
+users.email and users.phone were unique are migrated by running
+`manage.py find-duplicate-users`, resolving what it lists, then
+`manage.py check-indexes --fix`.
+"""
+
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Index options that make two indexes on the same keys behave differently
+COMPARED_OPTIONS = ["unique", "sparse", "partialFilterExpression", "expireAfterSeconds"]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Login; unique so registration rejects duplicates in its insert (phone is stored as digits only)
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("phone", ASCENDING)], unique=True),
+    ],
+    "properties": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # My Properties
+        IndexModel([("user_id", ASCENDING)]),
+        # Listings, newest first: one index per combination of equality filters, each followed by the
+        # (created_at, id) keyset so pages come straight off the index, with rent filtered on the keys
+        IndexModel([("available", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING), ("rent", ASCENDING)]),
+        IndexModel([
+            ("available", ASCENDING), ("city_key", ASCENDING),
+            ("created_at", DESCENDING), ("id", DESCENDING), ("rent", ASCENDING)
+        ]),
+        IndexModel([
+            ("available", ASCENDING), ("property_type", ASCENDING),
+            ("created_at", DESCENDING), ("id", DESCENDING), ("rent", ASCENDING)
+        ]),
+        IndexModel([
+            ("available", ASCENDING), ("city_key", ASCENDING), ("property_type", ASCENDING),
+            ("created_at", DESCENDING), ("id", DESCENDING), ("rent", ASCENDING)
+        ]),
+    ],
+    "chats": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Paging through one conversation's history in either direction
+        IndexModel([
+            ("property_id", ASCENDING), ("sender_id", ASCENDING), ("receiver_id", ASCENDING),
+            ("created_at", ASCENDING), ("id", ASCENDING)
+        ]),
+        # after_seq sync deltas and conversation mark-read
+        IndexModel([("property_id", ASCENDING), ("sender_id", ASCENDING), ("receiver_id", ASCENDING), ("seq", ASCENDING)]),
+        # Rebuilding conversation state per property (manage.py backfill/check)
+        IndexModel([("property_id", ASCENDING), ("created_at", DESCENDING)]),
+        # Only unread messages: recounts (including the lazy counter initialisation) use the receiver_id
+        # prefix, conversation mark-read the whole key, so neither walks the read history of a long thread
+        IndexModel(
+            [("receiver_id", ASCENDING), ("sender_id", ASCENDING), ("property_id", ASCENDING), ("seq", ASCENDING)],
+            partialFilterExpression={"is_read": False}
+        ),
+    ],
+    "conversations": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Inbox: a user's conversations, newest first
+        IndexModel([("participants", ASCENDING), ("last_message_time", DESCENDING)]),
+    ],
+    "image_variants": [
+        IndexModel([("digest", ASCENDING)], unique=True),
+    ],
+    "refresh_tokens": [
+        IndexModel([("token_hash", ASCENDING)], unique=True),
+        # Ending a session deletes all of its refresh tokens
+        IndexModel([("session_id", ASCENDING)]),
+        # Expired refresh tokens are removed by MongoDB
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "revoked_sessions": [
+        IndexModel([("session_id", ASCENDING)], unique=True),
+        # Revocations are dropped once every access token they cover has expired
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "unread_counters": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+}
+
+def key_pattern(key) -> tuple:
+    return tuple((field, int(direction)) for field, direction in key.items())
+
+def index_options(document: dict) -> dict:
+    return {option: document[option] for option in COMPARED_OPTIONS if option in document}
+
+def describe(key: tuple, options: dict) -> str:
+    keys = ", ".join(f"{field}: {direction}" for field, direction in key)
+    return f"{{{keys}}}" + (f" {options}" if options else "")
+
+async def index_drift(db) -> Dict[str, dict]:
+    """Compare declared and existing indexes of every registered collection.
+
+    Returns, per collection, the declared IndexModels that are `missing`, pairs of
+    (existing name, declared IndexModel) whose options `changed`, and the names of
+    `extra` indexes nobody declared.
+    """
+    report = {}
+    for collection, declared in INDEXES.items():
+        existing = {}
+        async for index in db[collection].list_indexes():
+            if index["name"] != "_id_":
+                existing[key_pattern(index["key"])] = index
+        missing, changed = [], []
+        for model in declared:
+            key = key_pattern(model.document["key"])
+            index = existing.pop(key, None)
+            if index is None:
+                missing.append(model)
+            elif index_options(index) != index_options(model.document):
+                changed.append((index["name"], model))
+        report[collection] = {
+            "missing": missing,
+            "changed": changed,
+            "extra": [index["name"] for index in existing.values()]
+        }
+    return report
+
+async def apply_indexes(db, fix: bool = False) -> Dict[str, dict]:
+    """Build missing indexes; with `fix`, also rebuild changed ones and drop undeclared ones.
+
+    Safe to run repeatedly: declared indexes that already exist are left alone.
+    Returns the drift found before applying, plus per collection the (IndexModel,
+    OperationFailure) pairs that `failed` to build, e.g. a unique index over
+    duplicate values. A failed build does not stop the other indexes being built.
+    """
+    report = await index_drift(db)
+    for collection, drift in report.items():
+        if fix:
+            for name in drift["extra"] + [name for name, _ in drift["changed"]]:
+                await db[collection].drop_index(name)
+        rebuild = drift["missing"] + ([model for _, model in drift["changed"]] if fix else [])
+        drift["failed"] = []
+        if rebuild:
+            try:
+                await db[collection].create_indexes(rebuild)
+            except OperationFailure:
+                # createIndexes is all-or-nothing, so find the culprits one index at a time
+                for model in rebuild:
+                    try:
+                        await db[collection].create_indexes([model])
+                    except OperationFailure as error:
+                        drift["failed"].append((model, error))
+    return report
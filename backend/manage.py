@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the FindMeRoom backend
+
+Run from the backend directory, e.g. `python manage.py backfill-conversations`
+"""
+
+import asyncio
+import re
+from typing import Optional
+
+import typer
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+
+from indexes import apply_indexes, describe, index_options, key_pattern
+from server import (
+    client,
+    conversation_query,
+    conversation_state_pipeline,
+    create_indexes,
+    IMAGE_REF_PATTERN,
+    IMAGE_REF_PREFIX,
+    db,
+    image_variants,
+    normalize_city,
+    reconcile_unread_counters,
+    shutdown_image_pool,
+    store_image
+)
+
+cli = typer.Typer(help="FindMeRoom maintenance commands")
+
+CONVERSATION_FIELDS = ["property_id", "participants", "last_message", "last_message_time", "last_sender_id", "last_seq", "unread"]
+
+def conversation_differs(expected: dict, stored: dict) -> bool:
+    return any(expected.get(field) != stored.get(field) for field in CONVERSATION_FIELDS)
+
+def unchanged_since(stored: dict) -> dict:
+    """Filter matching a conversation only while it still holds the state that was read"""
+    query = {"id": stored["id"]}
+    for field in CONVERSATION_FIELDS:
+        if field == "unread":
+            # Per participant, since embedded documents only match with their fields in the same order
+            for user_id, count in (stored.get("unread") or {}).items():
+                query[f"unread.{user_id}"] = count
+        else:
+            query[field] = stored.get(field)
+    return query
+
+async def current_conversation_state(conversation: dict) -> Optional[dict]:
+    """The state of one conversation derived from its messages as they are now"""
+    first, second = conversation["participants"]
+    match = conversation_query(conversation["property_id"], first, second)
+    async for state in db.chats.aggregate(conversation_state_pipeline(match)):
+        return state
+    return None
+
+def create_conversation(conversation: dict) -> UpdateOne:
+    """Upsert that creates a missing conversation and otherwise only ever raises its sequence counter.
+
+    The state comes from an aggregation that may be older than the stored document:
+    replacing it would lose messages sent meanwhile and move last_seq backwards,
+    so the next message would reuse a sequence number.
+    """
+    fields = {field: value for field, value in conversation.items() if field != "last_seq"}
+    return UpdateOne(
+        {"id": conversation["id"]},
+        {"$setOnInsert": fields, "$max": {"last_seq": conversation.get("last_seq")}},
+        upsert=True
+    )
+
+async def backfill_conversations(batch_size: int) -> int:
+    """Create the `conversations` documents missing for the messages in `chats`, writing in batches.
+
+    Existing documents are kept up to date by the chat routes; check-conversations repairs them.
+    """
+    await create_indexes()
+    created = 0
+    processed = 0
+    operations = []
+    cursor = db.chats.aggregate(conversation_state_pipeline(), allowDiskUse=True, batchSize=batch_size)
+    async for conversation in cursor:
+        operations.append(create_conversation(conversation))
+        if len(operations) >= batch_size:
+            result = await db.conversations.bulk_write(operations, ordered=False)
+            created += result.upserted_count
+            processed += len(operations)
+            operations = []
+            typer.echo(f"   {processed} conversations processed")
+    if operations:
+        result = await db.conversations.bulk_write(operations, ordered=False)
+        created += result.upserted_count
+    return created
+
+async def check_conversations(batch_size: int, fix: bool) -> dict:
+    """Compare `conversations` against the state derived from `chats`.
+
+    The full scan can lag behind live traffic, so each difference is confirmed
+    against the conversation's messages as they are now, and repairs only apply
+    to documents still holding the state that was compared. Conversations that
+    change in between are left for the next run and counted as `skipped`.
+    """
+    report = {"checked": 0, "missing": 0, "mismatched": 0, "orphaned": 0, "skipped": 0}
+    expected_ids = set()
+    repairs = []
+
+    async def compare(batch):
+        stored = {
+            doc["id"]: doc
+            async for doc in db.conversations.find({"id": {"$in": [c["id"] for c in batch]}}, {"_id": 0})
+        }
+        for conversation in batch:
+            current = stored.get(conversation["id"])
+            if current is None:
+                report["missing"] += 1
+                repairs.append(create_conversation(conversation))
+            elif conversation_differs(conversation, current):
+                # Read after the stored document, so a message racing the scan shows up here
+                conversation = await current_conversation_state(conversation)
+                if conversation is None or not conversation_differs(conversation, current):
+                    continue
+                report["mismatched"] += 1
+                typer.echo(f"   mismatch: {conversation['id']}")
+                # A counter behind the messages is raised, never lowered
+                fields = {field: conversation.get(field) for field in CONVERSATION_FIELDS if field != "last_seq"}
+                repairs.append(UpdateOne(
+                    unchanged_since(current),
+                    {"$set": fields, "$max": {"last_seq": conversation.get("last_seq")}}
+                ))
+
+    batch = []
+    cursor = db.chats.aggregate(conversation_state_pipeline(), allowDiskUse=True, batchSize=batch_size)
+    async for conversation in cursor:
+        report["checked"] += 1
+        expected_ids.add(conversation["id"])
+        batch.append(conversation)
+        if len(batch) >= batch_size:
+            await compare(batch)
+            batch = []
+    if batch:
+        await compare(batch)
+
+    async for doc in db.conversations.find({}, {"_id": 0}):
+        if doc["id"] in expected_ids:
+            continue
+        # Conversations are created before their first message is stored, so one may have just started
+        if doc.get("participants") and await current_conversation_state(doc) is not None:
+            continue
+        report["orphaned"] += 1
+        repairs.append(DeleteOne(unchanged_since(doc)))
+
+    if fix:
+        for start in range(0, len(repairs), batch_size):
+            result = await db.conversations.bulk_write(repairs[start:start + batch_size], ordered=False)
+            applied = result.matched_count + result.upserted_count + result.deleted_count
+            report["skipped"] += len(repairs[start:start + batch_size]) - applied
+    return report
+
+async def backfill_chat_seq(batch_size: int) -> int:
+    """Give messages that predate sequence numbers their place at the start of each conversation.
+
+    Messages sent since the deploy already hold 1..n, so they are shifted past the
+    backfilled ones. Needs the conversations collection, see backfill-conversations.
+    """
+    await create_indexes()
+    numbered = 0
+    async for conversation in db.conversations.find({}, {"_id": 0, "id": 1, "property_id": 1, "participants": 1}):
+        first, second = conversation["participants"]
+        legacy = [
+            doc["id"]
+            async for doc in db.chats.find(
+                conversation_query(conversation["property_id"], first, second, {"seq": None}), {"_id": 0, "id": 1}
+            ).sort([("created_at", 1), ("id", 1)])
+        ]
+        if not legacy:
+            continue
+        # Move the counter first so messages sent meanwhile are allocated past the shifted range,
+        # and shift only the numbers allocated before the move: later ones are already past it
+        before = await db.conversations.find_one_and_update(
+            {"id": conversation["id"]},
+            {"$inc": {"last_seq": len(legacy)}},
+            projection={"_id": 0, "last_seq": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        await db.chats.update_many(
+            conversation_query(
+                conversation["property_id"], first, second, {"seq": {"$ne": None, "$lte": before.get("last_seq") or 0}}
+            ),
+            {"$inc": {"seq": len(legacy)}}
+        )
+        operations = [UpdateOne({"id": message_id}, {"$set": {"seq": seq}}) for seq, message_id in enumerate(legacy, 1)]
+        for start in range(0, len(operations), batch_size):
+            await db.chats.bulk_write(operations[start:start + batch_size], ordered=False)
+        numbered += len(legacy)
+    return numbered
+
+async def backfill_city_key(batch_size: int, recompute: bool) -> int:
+    """Write the normalized city_key that the listing city filter matches on"""
+    await create_indexes()
+    written = 0
+    operations = []
+    query = {} if recompute else {"city_key": {"$exists": False}}
+    async for doc in db.properties.find(query, {"_id": 0, "id": 1, "city": 1}, batch_size=batch_size):
+        operations.append(UpdateOne({"id": doc["id"]}, {"$set": {"city_key": normalize_city(doc.get("city") or "")}}))
+        if len(operations) >= batch_size:
+            await db.properties.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+            typer.echo(f"   {written} properties written")
+    if operations:
+        await db.properties.bulk_write(operations, ordered=False)
+        written += len(operations)
+    return written
+
+async def migrate_images() -> dict:
+    """Move inline base64 images into the blob store, leaving references behind"""
+    counts = {"migrated": 0, "skipped": 0, "failed": 0}
+    query = {"images": {"$elemMatch": {"$not": re.compile("^" + re.escape(IMAGE_REF_PREFIX))}}}
+    # Ids first, so the cursor does not drag every inline image through memory at once
+    ids = [doc["id"] async for doc in db.properties.find(query, {"_id": 0, "id": 1})]
+    for property_id in ids:
+        doc = await db.properties.find_one({"id": property_id}, {"_id": 0, "images": 1})
+        if doc is None:
+            continue
+        try:
+            images = [await store_image(image) for image in doc["images"]]
+        except ValueError as e:
+            counts["failed"] += 1
+            typer.echo(f"   {property_id}: {e}")
+            continue
+        # Only swap in the references if nobody edited the images meanwhile
+        result = await db.properties.update_one({"id": property_id, "images": doc["images"]}, {"$set": {"images": images}})
+        counts["migrated" if result.modified_count else "skipped"] += 1
+    return counts
+
+async def generate_image_variants(concurrency: int) -> dict:
+    """Render the resized variants of every referenced image that does not have them yet"""
+    await create_indexes()
+    counts = {"rendered": 0, "failed": 0}
+    pipeline = [
+        {"$project": {"_id": 0, "images": 1}},
+        {"$unwind": "$images"},
+        {"$match": {"images": re.compile("^" + re.escape(IMAGE_REF_PREFIX))}},
+        {"$group": {"_id": "$images"}}
+    ]
+    pending = set()
+    async for doc in db.properties.aggregate(pipeline, allowDiskUse=True):
+        match = IMAGE_REF_PATTERN.match(doc["_id"])
+        if match:
+            pending.add(match.group(1))
+    async for doc in db.image_variants.find({}, {"_id": 0, "digest": 1}):
+        pending.discard(doc["digest"])
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def render(digest: str):
+        async with limit:
+            try:
+                variants = await image_variants(digest)
+            except ValueError as e:
+                variants, reason = None, str(e)
+            else:
+                reason = "blob is missing"
+        if variants is None:
+            counts["failed"] += 1
+            typer.echo(f"   {digest}: {reason}")
+        else:
+            counts["rendered"] += 1
+
+    await asyncio.gather(*(render(digest) for digest in pending))
+    return counts
+
+async def duplicate_users() -> dict:
+    """Emails and phone numbers held by more than one user, which block the unique users indexes"""
+    duplicates = {}
+    for field in ("email", "phone"):
+        pipeline = [
+            {"$group": {"_id": f"${field}", "ids": {"$push": "$id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        duplicates[field] = {doc["_id"]: doc["ids"] async for doc in db.users.aggregate(pipeline, allowDiskUse=True)}
+    return duplicates
+
+@cli.command("backfill-conversations")
+def backfill_conversations_command(
+    batch_size: int = typer.Option(500, help="Number of conversations written per bulk write")
+):
+    """Create conversations documents missing for existing chat messages."""
+    try:
+        created = asyncio.run(backfill_conversations(batch_size))
+    finally:
+        client.close()
+    typer.echo(f"✅ Backfilled {created} conversations")
+
+@cli.command("check-conversations")
+def check_conversations_command(
+    batch_size: int = typer.Option(500, help="Number of conversations compared per query"),
+    fix: bool = typer.Option(False, "--fix", help="Repair missing, stale and orphaned documents")
+):
+    """Report conversations whose stored state disagrees with the chat messages."""
+    try:
+        report = asyncio.run(check_conversations(batch_size, fix))
+    finally:
+        client.close()
+    typer.echo(
+        f"Checked {report['checked']} conversations: {report['missing']} missing, "
+        f"{report['mismatched']} mismatched, {report['orphaned']} orphaned"
+    )
+    if report["skipped"]:
+        typer.echo(f"   {report['skipped']} changed during the check and were left for the next run")
+    if report["missing"] or report["mismatched"] or report["orphaned"]:
+        typer.echo("✅ Repaired" if fix else "❌ Drift found (re-run with --fix to repair)")
+        if not fix:
+            raise typer.Exit(code=1)
+
+@cli.command("backfill-chat-seq")
+def backfill_chat_seq_command(
+    batch_size: int = typer.Option(1000, help="Number of messages numbered per bulk write")
+):
+    """Assign per-conversation sequence numbers to messages that have none."""
+    try:
+        numbered = asyncio.run(backfill_chat_seq(batch_size))
+    finally:
+        client.close()
+    typer.echo(f"✅ Numbered {numbered} messages")
+
+@cli.command("backfill-city-key")
+def backfill_city_key_command(
+    batch_size: int = typer.Option(1000, help="Number of properties written per bulk write"),
+    recompute: bool = typer.Option(False, "--all", help="Recompute every key, e.g. after changing normalize_city")
+):
+    """Write city_key on properties that predate it."""
+    try:
+        written = asyncio.run(backfill_city_key(batch_size, recompute))
+    finally:
+        client.close()
+    typer.echo(f"✅ Wrote city_key on {written} properties")
+
+@cli.command("migrate-images")
+def migrate_images_command():
+    """Move inline base64 listing images into the blob store."""
+    try:
+        counts = asyncio.run(migrate_images())
+    finally:
+        client.close()
+    typer.echo(f"✅ Migrated {counts['migrated']} properties ({counts['skipped']} changed meanwhile, {counts['failed']} failed)")
+    if counts["failed"]:
+        raise typer.Exit(code=1)
+
+@cli.command("generate-image-variants")
+def generate_image_variants_command(
+    concurrency: int = typer.Option(4, help="Number of images rendered at once")
+):
+    """Render thumbnail, card and full variants for images uploaded before they existed."""
+    try:
+        counts = asyncio.run(generate_image_variants(concurrency))
+    finally:
+        shutdown_image_pool(wait=True)
+        client.close()
+    typer.echo(f"✅ Rendered variants of {counts['rendered']} images ({counts['failed']} failed)")
+    if counts["failed"]:
+        raise typer.Exit(code=1)
+
+@cli.command("find-duplicate-users")
+def find_duplicate_users_command():
+    """List users sharing an email or phone number; resolve them before `check-indexes --fix` makes both unique."""
+    try:
+        duplicates = asyncio.run(duplicate_users())
+    finally:
+        client.close()
+    for field, groups in duplicates.items():
+        for value, ids in groups.items():
+            typer.echo(f"   {field} {value}: {', '.join(ids)}")
+    if not any(duplicates.values()):
+        typer.echo("✅ No duplicate users")
+    else:
+        typer.echo(f"❌ {sum(len(groups) for groups in duplicates.values())} duplicated emails or phone numbers")
+        raise typer.Exit(code=1)
+
+def report_failed_builds(report: dict):
+    failures = [(collection, model, error) for collection, drift in report.items() for model, error in drift["failed"]]
+    for collection, model, error in failures:
+        typer.echo(f"   {collection}: could not build {describe(key_pattern(model.document['key']), index_options(model.document))}: {error}")
+    if failures:
+        typer.echo("❌ Some indexes could not be built (for unique indexes, run find-duplicate-users first)")
+        raise typer.Exit(code=1)
+
+@cli.command("sync-indexes")
+def sync_indexes_command():
+    """Build any declared index that does not exist yet (also done at startup)."""
+    try:
+        report = asyncio.run(apply_indexes(db))
+    finally:
+        client.close()
+    built = sum(len(drift["missing"]) - len(drift["failed"]) for drift in report.values())
+    typer.echo(f"✅ Built {built} missing indexes")
+    report_failed_builds(report)
+
+@cli.command("check-indexes")
+def check_indexes_command(
+    fix: bool = typer.Option(False, "--fix", help="Build missing, rebuild changed and drop undeclared indexes")
+):
+    """Report drift between the indexes declared in indexes.py and those in the database."""
+    try:
+        report = asyncio.run(apply_indexes(db, fix=fix))
+    finally:
+        client.close()
+    drifted = False
+    for collection, drift in report.items():
+        for model in drift["missing"]:
+            typer.echo(f"   {collection}: missing {describe(key_pattern(model.document['key']), index_options(model.document))}")
+        for name, model in drift["changed"]:
+            typer.echo(f"   {collection}: {name} differs from declared {describe(key_pattern(model.document['key']), index_options(model.document))}")
+        for name in drift["extra"]:
+            typer.echo(f"   {collection}: undeclared index {name}")
+        drifted = drifted or any(drift.values())
+    report_failed_builds(report)
+    if not drifted:
+        typer.echo("✅ Indexes match the registry")
+    elif fix:
+        typer.echo("✅ Repaired")
+    else:
+        typer.echo("❌ Drift found (re-run with --fix to repair)")
+        raise typer.Exit(code=1)
+
+@cli.command("reconcile-unread")
+def reconcile_unread_command():
+    """Repair per-user unread counters from the chat messages."""
+    try:
+        repaired = asyncio.run(reconcile_unread_counters())
+    finally:
+        client.close()
+    typer.echo(f"✅ Repaired {repaired} unread counters")
+
+if __name__ == "__main__":
+    cli()
@@ -1,18 +1,51 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os 
+import sys
+import asyncio
 import logging
 from pathlib import Path 
 from pydantic import BaseModel, Field 
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 import uuid
+import json
+import secrets
+import time
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 import hashlib
+import base64
+import binascii
+import re
+import unicodedata
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import jwt
 from passlib.context import CryptContext
+try:
+    from python_multipart import MultipartParser
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart import MultipartParser
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import parse_options_header
+
+from bloom_filter import BloomFilter
+from blob_store import HEAD_SIZE, create_blob_store, sniff_image_type
+from chat_broker import create_broker
+from image_variants import VARIANT_FORMATS, VARIANT_SIZES, render_variants
+from indexes import apply_indexes, describe, index_options, key_pattern
+from password_hashing import PasswordHasher
+from ttl_cache import TTLCache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -30,9 +63,34 @@ api_router = APIRouter(prefix="/api")
 
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on its own threads, one per core unless configured otherwise
+password_hasher = PasswordHasher(pwd_context, int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)))
 JWT_SECRET = "your-secret-key-here"
 JWT_ALGORITHM = "HS256"
+# Access tokens are short-lived; clients renew them with a rotating refresh token
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=int(os.environ.get("ACCESS_TOKEN_MINUTES", "15")))
+REFRESH_TOKEN_LIFETIME = timedelta(days=int(os.environ.get("REFRESH_TOKEN_DAYS", "30")))
+# A refresh token presented again this soon after it was used is a concurrent refresh (e.g. two tabs), not theft
+REFRESH_REUSE_GRACE = timedelta(seconds=int(os.environ.get("REFRESH_REUSE_GRACE_SECONDS", "10")))
+
+# Revoked sessions are kept in a Bloom filter so checking one costs no database round trip
+REVOCATION_FILTER_CAPACITY = int(os.environ.get("REVOCATION_FILTER_CAPACITY", "100000"))
+# How often the filter is rebuilt from the database, which also forgets expired revocations
+REVOCATION_RELOAD_INTERVAL_SECONDS = int(os.environ.get("REVOCATION_RELOAD_INTERVAL_SECONDS", "300"))
+
+# Upper bound on how long a long-poll request is parked waiting for new messages
+LONG_POLL_MAX_SECONDS = 30
+
+# Comment lines sent on idle event streams so proxies keep the connection open
+SSE_HEARTBEAT_SECONDS = 15
+
+# A missing chat sequence number older than this is treated as a send that never completed
+CHAT_SEQ_GAP_GRACE_SECONDS = 10
+
+# How often drifted per-user unread counters are repaired from the chats collection
+UNREAD_RECONCILE_INTERVAL_SECONDS = int(os.environ.get("UNREAD_RECONCILE_INTERVAL_SECONDS", "900"))
 
 # Models
 class User(BaseModel):
@@ -63,12 +121,40 @@ class Property(BaseModel):
     deposit: int
     location: str
     city: str
-    images: List[str] = []  # base64 encoded images
+    images: List[str] = []  # /api/images/{digest} references to blobs in the blob store
     amenities: List[str] = []
     available: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PropertySummary(BaseModel):
+    """List-endpoint view of a property: scalar fields and one thumbnail instead of every image"""
+    id: str
+    user_id: str
+    title: str
+    description: str
+    property_type: str
+    rent: int
+    deposit: int
+    location: str
+    city: str
+    amenities: List[str] = []
+    available: bool = True
+    created_at: datetime
+    updated_at: datetime
+    thumbnail: Optional[str] = None
+
+# Fetch only what PropertySummary needs; images are sliced to the first one in the database
+PROPERTY_SUMMARY_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in PropertySummary.model_fields if field != "thumbnail"},
+    "images": {"$slice": 1}
+}
+
+def property_summary(doc: dict) -> PropertySummary:
+    images = doc.pop("images", None) or []
+    return PropertySummary(**doc, thumbnail=image_variant_url(images[0], "card") if images else None)
+
 class PropertyCreate(BaseModel):
     title: str
     description: str
@@ -80,6 +166,9 @@ class PropertyCreate(BaseModel):
     images: List[str] = []
     amenities: List[str] = []
 
+class ImageMove(BaseModel):
+    position: int = Field(ge=0)
+
 class PropertyUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -101,6 +190,8 @@ class Chat(BaseModel):
     is_read: bool = False
     read_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Position in the conversation, allocated from conversations.last_seq; None until backfilled
+    seq: Optional[int] = None
 
 class ChatCreate(BaseModel):
     property_id: str
@@ -110,6 +201,13 @@ class ChatCreate(BaseModel):
 class ChatMarkRead(BaseModel):
     message_ids: List[str]
 
+class ConversationMarkRead(BaseModel):
+    property_id: str
+    other_user_id: str
+    # Mark messages up to and including this position; with neither set, the whole conversation
+    up_to_seq: Optional[int] = None
+    up_to: Optional[datetime] = None
+
 class ConversationSummary(BaseModel):
     property_id: str
     property_title: str
@@ -125,38 +223,322 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     user: dict
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(hours=24)
+        expire = datetime.utcnow() + ACCESS_TOKEN_LIFETIME
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
+
+def encode_cursor(values: dict) -> str:
+    """Opaque pagination token"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> dict:
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
   
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    try:   
+# Verified token payloads by SHA-256 of the token, so a polling client's token is checked once, not per request
+jwt_cache = TTLCache(
+    max_size=int(os.environ.get("JWT_CACHE_SIZE", 10000)),
+    ttl=ACCESS_TOKEN_LIFETIME.total_seconds()
+)
+
+def decode_token(token: str) -> dict:
+    """Verified payload of a token; raises jwt.PyJWTError for invalid or expired tokens"""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = jwt_cache.get(key)
+    if payload is None:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        # Cached no longer than the token is valid
+        jwt_cache.set(key, payload, ttl=payload["exp"] - time.time() if "exp" in payload else None)
+    return payload
+
+# The authenticated user handlers see: just what they read, never the password hash
+PRINCIPAL_PROJECTION = {"_id": 0, "id": 1, "email": 1, "name": 1}
+principal_cache = TTLCache(
+    max_size=int(os.environ.get("PRINCIPAL_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+)
+
+async def load_principal(user_id: str) -> Optional[dict]:
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        principal = await db.users.find_one({"id": user_id}, PRINCIPAL_PROJECTION)
+        if principal is not None:
+            principal_cache.set(user_id, principal)
+    return principal
+
+async def invalidate_principal(user_id: str):
+    """Drop a user's cached principal on every worker; call after updating or deleting the user"""
+    principal_cache.pop(user_id)
+    await chat_broker.publish({"kind": "principal_changed", "user_id": user_id})
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_tokens(user_id: str, session_id: Optional[str] = None) -> dict:
+    """An access token and a new refresh token for a login session, starting one if none is given"""
+    session_id = session_id or uuid.uuid4().hex
+    refresh_token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    # Only the hash is stored, so a database leak does not hand out sessions
+    await db.refresh_tokens.insert_one({
+        "token_hash": hash_refresh_token(refresh_token),
+        "user_id": user_id,
+        "session_id": session_id,
+        "created_at": now,
+        "expires_at": now + REFRESH_TOKEN_LIFETIME,
+        "used_at": None
+    })
+    return {
+        "access_token": create_access_token(data={"sub": user_id, "sid": session_id}),
+        "refresh_token": refresh_token,
+        "expires_in": int(ACCESS_TOKEN_LIFETIME.total_seconds())
+    }
+
+revoked_sessions = BloomFilter(REVOCATION_FILTER_CAPACITY)
+# Revocations broadcast while the filter is being rebuilt, replayed onto the rebuilt filter
+revocations_during_reload: Optional[List[str]] = None
+
+def remember_revocation(session_id: str):
+    revoked_sessions.add(session_id)
+    if revocations_during_reload is not None:
+        revocations_during_reload.append(session_id)
+
+async def load_revocations():
+    """Rebuild the revoked-session filter from the database"""
+    global revoked_sessions, revocations_during_reload
+    revocations_during_reload = []
+    try:
+        count = await db.revoked_sessions.estimated_document_count()
+        rebuilt = BloomFilter(max(REVOCATION_FILTER_CAPACITY, count * 2))
+        cursor = db.revoked_sessions.find({"expires_at": {"$gt": datetime.utcnow()}}, {"_id": 0, "session_id": 1})
+        async for doc in cursor:
+            rebuilt.add(doc["session_id"])
+        for session_id in revocations_during_reload:
+            rebuilt.add(session_id)
+        revoked_sessions = rebuilt
+    finally:
+        revocations_during_reload = None
+
+async def revocation_reload_loop():
+    while True:
+        await asyncio.sleep(REVOCATION_RELOAD_INTERVAL_SECONDS)
+        try:
+            await load_revocations()
+        except Exception:
+            logger.exception("Reloading revoked sessions failed")
+
+async def session_revoked(session_id: str) -> bool:
+    # The filter has no false negatives, so only a hit needs confirming
+    if session_id not in revoked_sessions:
+        return False
+    return await db.revoked_sessions.find_one({"session_id": session_id}, {"_id": 1}) is not None
+
+async def revoke_session(session_id: str):
+    """End a login session on every worker: its refresh tokens stop working and its access tokens are rejected"""
+    # Access tokens issued before now expire within ACCESS_TOKEN_LIFETIME, so the record is not needed after that.
+    # It is written before the refresh tokens are deleted so a concurrent refresh cannot outlive it.
+    await db.revoked_sessions.update_one(
+        {"session_id": session_id},
+        {"$setOnInsert": {"session_id": session_id, "expires_at": datetime.utcnow() + ACCESS_TOKEN_LIFETIME}},
+        upsert=True
+    )
+    await db.refresh_tokens.delete_many({"session_id": session_id})
+    remember_revocation(session_id)
+    await chat_broker.publish({"kind": "session_revoked", "session_id": session_id})
+
+async def get_user_from_token(token: str):
+    try:   
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        user = await db.users.find_one({"id": user_id})
+        # Tokens issued before sessions existed carry no sid and simply run out
+        if "sid" in payload and await session_revoked(payload["sid"]):
+            raise HTTPException(status_code=401, detail="Session has ended")
+        user = await load_principal(user_id)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         return user
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await get_user_from_token(credentials.credentials)
+
+async def stream_session(token: str) -> dict:
+    """The user behind a long-lived connection's token, the session it belongs to and when the token expires"""
+    user = await get_user_from_token(token)
+    payload = decode_token(token)
+    return {"user": user, "session_id": payload.get("sid"), "expires_at": payload.get("exp", float("inf"))}
+
+async def get_stream_session(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    # EventSource cannot set headers, so streams also accept the token as a query parameter
+    if credentials is not None:
+        token = credentials.credentials
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await stream_session(token)
+
+class ChatHub:
+    """In-process fan-out of chat events to every open connection of a user.
+
+    Each user's events are numbered and the most recent ones are kept, so a
+    reconnecting event stream can resume from its Last-Event-ID. Queues are also
+    grouped by login session; ending a session puts `(0, None)` on its queues
+    to tell their connections to close.
+    """
+
+    def __init__(self, queue_size: int = 100, history_size: int = 50, max_histories: int = 10000):
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self.max_histories = max_histories
+        # Event ids from a previous process (or another worker) cannot be replayed
+        self.epoch = uuid.uuid4().hex[:8]
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._sessions: Dict[str, Set[asyncio.Queue]] = {}
+        self._histories: "OrderedDict[str, dict]" = OrderedDict()
+        # conversation key -> [event set on the next message, number of parked requests]
+        self._conversation_waiters: Dict[str, list] = {}
+
+    def subscribe(self, user_id: str, session_id: Optional[str] = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        if session_id is not None:
+            self._sessions.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue, session_id: Optional[str] = None):
+        for index, key in ((self._subscribers, user_id), (self._sessions, session_id)):
+            queues = index.get(key)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del index[key]
+
+    def end_session(self, session_id: str):
+        for queue in self._sessions.pop(session_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((0, None))
+
+    def publish(self, user_id: str, event: dict):
+        seq = self._record(user_id, event)
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                # A stalled client only loses its oldest pending event
+                queue.get_nowait()
+            queue.put_nowait((seq, event))
+
+    def watch_conversation(self, key: str) -> asyncio.Event:
+        """Event that is set when the next message is posted to the conversation"""
+        waiter = self._conversation_waiters.get(key)
+        if waiter is None:
+            waiter = self._conversation_waiters[key] = [asyncio.Event(), 0]
+        waiter[1] += 1
+        return waiter[0]
+
+    def unwatch_conversation(self, key: str, event: asyncio.Event):
+        waiter = self._conversation_waiters.get(key)
+        if waiter is None or waiter[0] is not event:
+            return
+        waiter[1] -= 1
+        if waiter[1] == 0:
+            del self._conversation_waiters[key]
+
+    def notify_conversation(self, key: str):
+        waiter = self._conversation_waiters.pop(key, None)
+        if waiter is not None:
+            waiter[0].set()
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def replay(self, user_id: str, last_event_id: str) -> Optional[List[tuple]]:
+        """(seq, event) pairs published after `last_event_id`, or None if some are no longer kept"""
+        epoch, _, last_seq = last_event_id.partition("-")
+        history = self._histories.get(user_id)
+        if epoch != self.epoch or not last_seq.isdigit() or history is None:
+            return None
+        last_seq = int(last_seq)
+        oldest = history["events"][0][0] if history["events"] else history["seq"] + 1
+        if last_seq < oldest - 1 or last_seq > history["seq"]:
+            return None
+        return [(seq, event) for seq, event in history["events"] if seq > last_seq]
+
+    def _record(self, user_id: str, event: dict) -> int:
+        history = self._histories.pop(user_id, None) or {"seq": 0, "events": deque(maxlen=self.history_size)}
+        self._histories[user_id] = history
+        if len(self._histories) > self.max_histories:
+            self._histories.popitem(last=False)
+        history["seq"] += 1
+        history["events"].append((history["seq"], event))
+        return history["seq"]
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+chat_hub = ChatHub()
+
+# Events go through the broker so that, with several workers, each one reaches the connections it holds
+chat_broker = create_broker(
+    os.environ.get("CHAT_BROKER", "memory"),
+    os.environ.get("CHAT_BROKER_SOCKET", "/tmp/findmeroom-chat.sock")
+)
+
+async def publish_chat_event(user_id: str, event: dict):
+    await chat_broker.publish({"kind": "user_event", "user_id": user_id, "event": event})
+
+async def publish_conversation_changed(key: str):
+    await chat_broker.publish({"kind": "conversation_changed", "key": key})
+
+def dispatch_broker_message(message: dict):
+    """Apply a broker message from any worker to this worker's hub"""
+    if message["kind"] == "user_event":
+        chat_hub.publish(message["user_id"], message["event"])
+    elif message["kind"] == "conversation_changed":
+        chat_hub.notify_conversation(message["key"])
+    elif message["kind"] == "principal_changed":
+        principal_cache.pop(message["user_id"])
+    elif message["kind"] == "session_revoked":
+        remember_revocation(message["session_id"])
+        chat_hub.end_session(message["session_id"])
+
+def duplicate_key_field(error: DuplicateKeyError) -> Optional[str]:
+    """The first field of the unique index a duplicate key error was raised on"""
+    details = error.details or {}
+    fields = details.get("keyPattern") or details.get("keyValue")
+    if fields:
+        return next(iter(fields))
+    # Servers before 4.2 only name the index in the message, e.g. "index: phone_1 dup key"
+    match = re.search(r"index: (\w+?)_-?1", details.get("errmsg") or str(error))
+    return match.group(1) if match else None
+
 # Authentication routes
 @api_router.post("/auth/register", response_model=TokenResponse)
 async def register(user_data: UserCreate):
@@ -165,66 +547,351 @@ async def register(user_data: UserCreate):
     if len(phone_digits) < 10 or len(phone_digits) > 15:
         raise HTTPException(status_code=400, detail="Phone number must be between 10-15 digits")
     
-    # Check if user already exists by email
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Check if phone number already exists (check against cleaned digits)
-    existing_phone = await db.users.find_one({"phone": phone_digits})
-    if existing_phone:
-        raise HTTPException(status_code=400, detail="Phone number already registered")
-    
     # Create new user
     user_dict = user_data.dict()
-    user_dict["password_hash"] = get_password_hash(user_data.password)
+    user_dict["password_hash"] = await get_password_hash(user_data.password)
     user_dict["phone"] = phone_digits  # Store only digits
     del user_dict["password"]
     
+    # The unique email and phone indexes reject duplicates, including concurrent registrations
     user_obj = User(**user_dict)
-    await db.users.insert_one(user_obj.dict())
+    try:
+        await db.users.insert_one(user_obj.dict())
+    except DuplicateKeyError as e:
+        if duplicate_key_field(e) == "phone":
+            raise HTTPException(status_code=400, detail="Phone number already registered")
+        raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create access token
-    access_token = create_access_token(data={"sub": user_obj.id})
+    # Start a login session
+    tokens = await issue_tokens(user_obj.id)
     
     return TokenResponse(
-        access_token=access_token,
         token_type="bearer",
-        user={"id": user_obj.id, "email": user_obj.email, "name": user_obj.name}
+        user={"id": user_obj.id, "email": user_obj.email, "name": user_obj.name},
+        **tokens
     )
 
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(user_credentials: UserLogin):
     user = await db.users.find_one({"email": user_credentials.email})
-    if not user or not verify_password(user_credentials.password, user["password_hash"]):
+    if not user or not await verify_password(user_credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    access_token = create_access_token(data={"sub": user["id"]})
+    tokens = await issue_tokens(user["id"])
+    
+    return TokenResponse(
+        token_type="bearer",
+        user={"id": user["id"], "email": user["email"], "name": user["name"]},
+        **tokens
+    )
+
+@api_router.post("/auth/refresh", response_model=TokenResponse)
+async def refresh_session(refresh_data: RefreshRequest):
+    token_hash = hash_refresh_token(refresh_data.refresh_token)
+    now = datetime.utcnow()
+    # Each refresh token works once; claiming it is atomic so two concurrent refreshes cannot both succeed
+    stored = await db.refresh_tokens.find_one_and_update(
+        {"token_hash": token_hash, "used_at": None},
+        {"$set": {"used_at": now}}
+    )
+    if stored is None:
+        stored = await db.refresh_tokens.find_one({"token_hash": token_hash})
+        if stored is None:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        if now - stored["used_at"] > REFRESH_REUSE_GRACE:
+            # A rotated-out token came back long after its rotation, so it has leaked: end the whole session
+            await revoke_session(stored["session_id"])
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        # Another request rotated it moments ago; give this one its own tokens in the same session
+    if stored["expires_at"] <= now:
+        raise HTTPException(status_code=401, detail="Refresh token has expired")
+    
+    user = await load_principal(stored["user_id"])
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    tokens = await issue_tokens(user["id"], stored["session_id"])
+    # A logout racing this refresh either deletes the new refresh token or is seen here
+    if await db.revoked_sessions.find_one({"session_id": stored["session_id"]}, {"_id": 1}):
+        await db.refresh_tokens.delete_many({"session_id": stored["session_id"]})
+        raise HTTPException(status_code=401, detail="Session has ended")
     
     return TokenResponse(
-        access_token=access_token,
         token_type="bearer",
-        user={"id": user["id"], "email": user["email"], "name": user["name"]}
+        user={"id": user["id"], "email": user["email"], "name": user["name"]},
+        **tokens
     )
 
+@api_router.post("/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    await get_user_from_token(credentials.credentials)
+    session_id = decode_token(credentials.credentials).get("sid")
+    if session_id is not None:
+        await revoke_session(session_id)
+    return {"message": "Logged out"}
+
 @api_router.get("/auth/me")
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     return {"id": current_user["id"], "email": current_user["email"], "name": current_user["name"]}
 
+# Listing images live in the blob store; properties keep `/api/images/<sha256>` references
+blob_store = create_blob_store(
+    os.environ.get("BLOB_STORE", "local"),
+    os.environ.get("BLOB_STORE_PATH", str(ROOT_DIR / "blobs")),
+    bucket=os.environ.get("S3_BUCKET"),
+    prefix=os.environ.get("S3_PREFIX", "images/"),
+    endpoint_url=os.environ.get("S3_ENDPOINT_URL")
+)
+
+IMAGE_REF_PREFIX = "/api/images/"
+IMAGE_REF_PATTERN = re.compile(r"^/api/images/([0-9a-f]{64})$")
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_PROPERTY_IMAGES = 20
+
+async def store_image(image: str) -> str:
+    """Reference for an image given as a reference, a data URL or bare base64.
+
+    Raises ValueError for anything that is not a supported image.
+    """
+    match = IMAGE_REF_PATTERN.match(image)
+    if match:
+        if await blob_store.stat(match.group(1)) is None:
+            raise ValueError("Unknown image reference")
+        return image
+    if image.startswith("data:"):
+        image = image.partition(",")[2]
+    image = "".join(image.split())
+    if len(image) > (MAX_IMAGE_BYTES // 3 + 1) * 4:
+        raise ValueError("Image is too large")
+    try:
+        data = base64.b64decode(image, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Image is not valid base64")
+    content_type = sniff_image_type(data[:16])
+    if content_type is None:
+        raise ValueError("Unsupported image format")
+    return IMAGE_REF_PREFIX + await blob_store.put(data, content_type)
+
+async def store_images(images: List[str]) -> List[str]:
+    if len(images) > MAX_PROPERTY_IMAGES:
+        raise HTTPException(status_code=400, detail=f"A listing can have at most {MAX_PROPERTY_IMAGES} images")
+    try:
+        return [await store_image(image) for image in images]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def receive_image_uploads(request: Request, max_count: int) -> List[str]:
+    """Store every part of a multipart/form-data request body as an image and return their references.
+
+    The body is parsed as it arrives and each part goes straight to a blob writer, so memory
+    use does not depend on image size. Limits are enforced as bytes arrive.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data body")
+    
+    # The parser calls back synchronously; events are drained after each chunk so writes can be awaited
+    events = []
+    parser = MultipartParser(boundary, {
+        "on_part_begin": lambda: events.append(("begin", None)),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None))
+    })
+    references = []
+    writer = None
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError:
+                raise HTTPException(status_code=400, detail="Malformed multipart body")
+            for event, data in events:
+                if event == "begin":
+                    if len(references) >= max_count:
+                        raise HTTPException(status_code=413, detail=f"A listing can have at most {MAX_PROPERTY_IMAGES} images")
+                    writer = blob_store.writer()
+                elif event == "data":
+                    await writer.write(data)
+                    if writer.size > MAX_IMAGE_BYTES:
+                        raise HTTPException(status_code=413, detail="Image is too large")
+                    if len(writer.head) >= HEAD_SIZE and sniff_image_type(writer.head) is None:
+                        raise HTTPException(status_code=415, detail="Unsupported image format")
+                else:
+                    image_type = sniff_image_type(writer.head)
+                    if image_type is None:
+                        raise HTTPException(status_code=415, detail="Unsupported image format")
+                    references.append(IMAGE_REF_PREFIX + await writer.commit(image_type))
+                    writer = None
+            events.clear()
+        parser.finalize()
+        if writer is not None:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+    finally:
+        if writer is not None:
+            await writer.abort()
+    if not references:
+        raise HTTPException(status_code=400, detail="No images in the request")
+    return references
+
+def image_variant_url(image: Optional[str], size: str) -> Optional[str]:
+    """URL of a resized variant of an image reference; inline images predating the blob store are returned as they are"""
+    if image and IMAGE_REF_PATTERN.match(image):
+        return f"{image}?size={size}"
+    return image
+
+# Resizing is CPU-bound, so it runs in worker processes. Workers are spawned rather than forked
+# so they do not inherit the event loop and the database client's threads.
+def create_image_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=int(os.environ.get("IMAGE_WORKERS", os.cpu_count() or 1)),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+image_pool = create_image_pool()
+
+def shutdown_image_pool(wait: bool = False):
+    image_pool.shutdown(wait=wait, cancel_futures=True)
+# Original digest -> task rendering its variants, so concurrent requests share one render
+variant_jobs: Dict[str, asyncio.Task] = {}
+
+def stored_variants(doc: dict) -> dict:
+    """The variants recorded for an image; raises ValueError if it was found to be unrenderable"""
+    if "error" in doc:
+        raise ValueError(doc["error"])
+    return doc["variants"]
+
+async def render_in_pool(data: bytes) -> dict:
+    """render_variants on the image pool, replacing the pool if a worker dies"""
+    global image_pool
+    for _ in range(2):
+        pool = image_pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, render_variants, data)
+        except BrokenProcessPool:
+            # A dead worker breaks the pool for every job in it; the first job to notice replaces it
+            if image_pool is pool:
+                logger.warning("An image worker died; restarting the image pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                image_pool = create_image_pool()
+    # Broke again with this image in it, so the image itself is the likely cause
+    raise ValueError("Rendering the image crashed its worker")
+
+async def render_and_store_variants(digest: str) -> Optional[dict]:
+    # Identical uploads share a digest, so the variants may already exist
+    doc = await db.image_variants.find_one({"digest": digest}, {"_id": 0, "variants": 1, "error": 1})
+    if doc:
+        return stored_variants(doc)
+    data = await blob_store.read(digest)
+    if data is None:
+        return None
+    try:
+        rendered = await render_in_pool(data)
+    except ValueError as e:
+        # Recorded so an unrenderable image is not decoded again on every request
+        await db.image_variants.update_one(
+            {"digest": digest},
+            {"$setOnInsert": {"digest": digest, "error": str(e), "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        raise
+    variants = {}
+    for size, encoded in rendered.items():
+        variants[size] = {
+            image_format: await blob_store.put(blob, VARIANT_FORMATS[image_format])
+            for image_format, blob in encoded.items()
+        }
+    # The first render wins, so a variant URL always serves the same bytes
+    doc = await db.image_variants.find_one_and_update(
+        {"digest": digest},
+        {"$setOnInsert": {"digest": digest, "variants": variants, "created_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return stored_variants(doc)
+
+def finish_variant_job(digest: str, job: asyncio.Task):
+    variant_jobs.pop(digest, None)
+    if not job.cancelled() and job.exception() is not None:
+        logger.warning("Could not render variants of image %s: %s", digest, job.exception())
+
+def variant_job(digest: str) -> asyncio.Task:
+    """The render of an image's variants, starting one unless it is already running"""
+    job = variant_jobs.get(digest)
+    if job is None:
+        job = variant_jobs[digest] = asyncio.create_task(render_and_store_variants(digest))
+        job.add_done_callback(lambda done: finish_variant_job(digest, done))
+    return job
+
+async def image_variants(digest: str) -> Optional[dict]:
+    """{size: {format: digest}} of an original image, rendering them first if needed.
+
+    Returns None for unknown images; raises ValueError for images that cannot be rendered.
+    """
+    doc = await db.image_variants.find_one({"digest": digest}, {"_id": 0, "variants": 1, "error": 1})
+    if doc:
+        return stored_variants(doc)
+    # A client going away must not cancel a render other requests are waiting on
+    return await asyncio.shield(variant_job(digest))
+
+def enqueue_image_variants(images: List[str]):
+    """Start rendering variants of newly stored images without waiting for them"""
+    for image in images:
+        variant_job(IMAGE_REF_PATTERN.match(image).group(1))
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple]:
+    """(start, end) of a single `bytes=start-end` range, or None if it lies outside the blob.
+
+    Raises ValueError for headers this endpoint does not handle, which are ignored.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError("Unsupported range")
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length > 0 else None
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    return (start, end) if start < size and start <= end else None
+
 # Property routes
-@api_router.get("/properties", response_model=List[Property])
-async def get_properties(
+def normalize_city(city: str) -> str:
+    """Key that city filters compare against: case- and whitespace-insensitive"""
+    return " ".join(unicodedata.normalize("NFKC", city).casefold().split())
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with `prefix`, or None if there is none"""
+    # The highest code point cannot be incremented, so drop it and increment what comes before
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    # Surrogates are not valid in stored strings; the next character after U+D7FF is U+E000
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+    return prefix[:-1] + chr(following)
+
+def properties_query(
     city: Optional[str] = None,
+    city_match: str = "exact",
     property_type: Optional[str] = None,
     min_rent: Optional[int] = None,
-    max_rent: Optional[int] = None,
-    skip: int = 0,
-    limit: int = 20
-):
+    max_rent: Optional[int] = None
+) -> dict:
     query = {"available": True}
     
-    if city:
-        query["city"] = {"$regex": city, "$options": "i"}
+    key = normalize_city(city) if city else ""
+    if key:
+        if city_match == "prefix":
+            # Anchored prefix as a plain index range: every key from `key` up to the next possible prefix
+            query["city_key"] = {"$gte": key}
+            upper = prefix_upper_bound(key)
+            if upper is not None:
+                query["city_key"]["$lt"] = upper
+        else:
+            query["city_key"] = key
     if property_type:
         query["property_type"] = property_type
     if min_rent is not None:
@@ -234,9 +901,47 @@ async def get_properties(
             query["rent"]["$lte"] = max_rent
         else:
             query["rent"] = {"$lte": max_rent}
+    return query
+
+@api_router.get("/properties", response_model=List[PropertySummary])
+async def get_properties(
+    response: Response,
+    city: Optional[str] = None,
+    city_match: str = "exact",
+    property_type: Optional[str] = None,
+    min_rent: Optional[int] = None,
+    max_rent: Optional[int] = None,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20
+):
+    # Newest listings first, paged by keyset over (created_at, id): pass a page's X-Next-Cursor
+    # as `cursor` to get the next one. `skip` still works for older clients but rescans earlier pages.
+    if city_match not in ("exact", "prefix"):
+        raise HTTPException(status_code=400, detail="city_match must be exact or prefix")
+    limit = min(max(limit, 1), 100)
+    query = properties_query(city, city_match, property_type, min_rent, max_rent)
+    
+    if city_match == "prefix" and "city_key" in query:
+        # Resolve the prefix to the cities it matches so each one is an index point the sort can merge across
+        city_keys = await db.properties.distinct("city_key", {"available": True, "city_key": query["city_key"]})
+        query["city_key"] = {"$in": city_keys}
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            created_at, property_id = datetime.fromisoformat(values["t"]), values["id"]
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["created_at"] = {"$lte": created_at}
+        query["$or"] = [{"created_at": {"$lt": created_at}}, {"id": {"$lt": property_id}}]
     
-    properties = await db.properties.find(query).skip(skip).limit(limit).to_list(length=limit)
-    return [Property(**prop) for prop in properties]
+    properties = await db.properties.find(query, PROPERTY_SUMMARY_PROJECTION).sort(
+        [("created_at", -1), ("id", -1)]
+    ).skip(skip).limit(limit).to_list(length=limit)
+    if len(properties) == limit:
+        last = properties[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor({"t": last["created_at"].isoformat(), "id": last["id"]})
+    return [property_summary(prop) for prop in properties]
 
 @api_router.get("/properties/{property_id}", response_model=Property)
 async def get_property(property_id: str):
@@ -249,9 +954,11 @@ async def get_property(property_id: str):
 async def create_property(property_data: PropertyCreate, current_user: dict = Depends(get_current_user)):
     property_dict = property_data.dict()
     property_dict["user_id"] = current_user["id"]
+    property_dict["images"] = await store_images(property_dict["images"])
+    enqueue_image_variants(property_dict["images"])
     
     property_obj = Property(**property_dict)
-    await db.properties.insert_one(property_obj.dict())
+    await db.properties.insert_one({**property_obj.dict(), "city_key": normalize_city(property_obj.city)})
     
     return property_obj
 
@@ -266,12 +973,85 @@ async def update_property(property_id: str, property_data: PropertyUpdate, curre
     
     update_data = {k: v for k, v in property_data.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
+    if "city" in update_data:
+        update_data["city_key"] = normalize_city(update_data["city"])
+    if "images" in update_data:
+        update_data["images"] = await store_images(update_data["images"])
+        enqueue_image_variants(update_data["images"])
     
     await db.properties.update_one({"id": property_id}, {"$set": update_data})
     
     updated_property = await db.properties.find_one({"id": property_id})
     return Property(**updated_property)
 
+async def owned_property_images(property_id: str, current_user: dict) -> dict:
+    """The images of a property the current user may edit"""
+    property_doc = await db.properties.find_one({"id": property_id}, {"_id": 0, "user_id": 1, "images": 1})
+    if not property_doc:
+        raise HTTPException(status_code=404, detail="Property not found")
+    
+    if property_doc["user_id"] != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Not authorized to update this property")
+    return property_doc
+
+@api_router.post("/properties/{property_id}/images", response_model=List[str])
+async def upload_property_images(
+    property_id: str,
+    request: Request,
+    position: Optional[int] = Query(None, ge=0, description="Insert at this index instead of appending"),
+    current_user: dict = Depends(get_current_user)
+):
+    property_doc = await owned_property_images(property_id, current_user)
+    references = await receive_image_uploads(request, MAX_PROPERTY_IMAGES - len(property_doc.get("images") or []))
+    # Add only while the listing still has room, in case another upload finished first
+    push = {"$each": references, **({"$position": position} if position is not None else {})}
+    result = await db.properties.update_one(
+        {"id": property_id, f"images.{MAX_PROPERTY_IMAGES - len(references)}": {"$exists": False}},
+        {"$push": {"images": push}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    if not result.matched_count:
+        raise HTTPException(status_code=413, detail=f"A listing can have at most {MAX_PROPERTY_IMAGES} images")
+    enqueue_image_variants(references)
+    return references
+
+@api_router.delete("/properties/{property_id}/images/{digest}", response_model=List[str])
+async def delete_property_image(property_id: str, digest: str, current_user: dict = Depends(get_current_user)):
+    await owned_property_images(property_id, current_user)
+    property_doc = await db.properties.find_one_and_update(
+        {"id": property_id, "images": IMAGE_REF_PREFIX + digest},
+        {"$pull": {"images": IMAGE_REF_PREFIX + digest}, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 0, "images": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not property_doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return property_doc["images"]
+
+@api_router.patch("/properties/{property_id}/images/{digest}", response_model=List[str])
+async def move_property_image(
+    property_id: str, digest: str, move: ImageMove, current_user: dict = Depends(get_current_user)
+):
+    await owned_property_images(property_id, current_user)
+    reference = IMAGE_REF_PREFIX + digest
+    others = {"$filter": {"input": "$images", "cond": {"$ne": ["$$this", reference]}}}
+    # One pipeline update sets the reordered array, so concurrent edits cannot interleave
+    property_doc = await db.properties.find_one_and_update(
+        {"id": property_id, "images": reference},
+        [{"$set": {
+            "images": {"$concatArrays": [
+                {"$slice": [others, move.position]},
+                [reference],
+                {"$slice": [others, move.position, MAX_PROPERTY_IMAGES]}
+            ]},
+            "updated_at": datetime.utcnow()
+        }}],
+        projection={"_id": 0, "images": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not property_doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return property_doc["images"]
+
 @api_router.delete("/properties/{property_id}")
 async def delete_property(property_id: str, current_user: dict = Depends(get_current_user)):
     property_doc = await db.properties.find_one({"id": property_id})
@@ -284,10 +1064,318 @@ async def delete_property(property_id: str, current_user: dict = Depends(get_cur
     await db.properties.delete_one({"id": property_id})
     return {"message": "Property deleted successfully"}
 
-@api_router.get("/my-properties", response_model=List[Property])
+@api_router.get("/images/{digest}")
+async def get_image(
+    digest: str,
+    size: Optional[str] = None,
+    image_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None)
+):
+    if not re.fullmatch(r"[0-9a-f]{64}", digest):
+        raise HTTPException(status_code=404, detail="Image not found")
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "Accept-Ranges": "bytes"}
+    
+    if size is not None:
+        if size not in VARIANT_SIZES:
+            raise HTTPException(status_code=400, detail=f"size must be one of: {', '.join(VARIANT_SIZES)}")
+        if image_format is None:
+            image_format = "webp" if accept and "image/webp" in accept else "jpeg"
+            headers["Vary"] = "Accept"
+        elif image_format not in VARIANT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(VARIANT_FORMATS)}")
+        try:
+            variants = await image_variants(digest)
+        except ValueError:
+            variants = None
+        if variants is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        digest = variants[size][image_format]
+    
+    # Blobs are content-addressed and variants never change once rendered, so responses can be cached forever
+    info = await blob_store.stat(digest)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    etag = f'"{digest}"'
+    headers["ETag"] = etag
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    size = info["size"]
+    start, end, status_code = 0, size - 1, 200
+    if range_header:
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            byte_range = (start, end)
+        else:
+            if byte_range is None:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            status_code = 206
+            headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+        start, end = byte_range
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.stream(digest, start, end), status_code=status_code, media_type=info["content_type"], headers=headers
+    )
+
+@api_router.get("/my-properties", response_model=List[PropertySummary])
 async def get_my_properties(current_user: dict = Depends(get_current_user)):
-    properties = await db.properties.find({"user_id": current_user["id"]}).to_list(length=100)
-    return [Property(**prop) for prop in properties]
+    properties = await db.properties.find({"user_id": current_user["id"]}, PROPERTY_SUMMARY_PROJECTION).to_list(length=100)
+    return [property_summary(prop) for prop in properties]
+
+# Conversation helpers
+def conversation_key(property_id: str, user_a: str, user_b: str) -> str:
+    """Stable id of the conversation between two users about a property"""
+    first, second = sorted([user_a, user_b])
+    return f"{property_id}:{first}:{second}"
+
+def conversation_query(property_id: str, user_id: str, other_user_id: str, extra: Optional[dict] = None) -> dict:
+    """Filter for one conversation's messages.
+
+    Each direction is its own $or branch so both are range scans on the
+    (property_id, sender_id, receiver_id, ...) chat indexes.
+    """
+    extra = extra or {}
+    return {
+        "$or": [
+            {"property_id": property_id, "sender_id": user_id, "receiver_id": other_user_id, **extra},
+            {"property_id": property_id, "sender_id": other_user_id, "receiver_id": user_id, **extra}
+        ]
+    }
+
+def conversation_state_pipeline(match: Optional[dict] = None) -> list:
+    """Aggregation over `chats` that rebuilds `conversations` documents.
+
+    Each (property_id, participant pair) group keeps only its newest message and
+    per-participant unread counts, so intermediate documents stay small no matter
+    how long a thread is. Used by the backfill and consistency jobs in manage.py.
+    """
+    first = {"$arrayElemAt": ["$_id.participants", 0]}
+    second = {"$arrayElemAt": ["$_id.participants", 1]}
+    return [
+        {
+            "$match": match or {}
+        },
+        # Newest first within each property: the order $first relies on, and the order of the
+        # (property_id, created_at) index, so a full rebuild streams off it instead of sorting in memory
+        {
+            "$sort": {"property_id": 1, "created_at": -1}
+        },
+        # Only carry the fields the $group stage reads
+        {
+            "$project": {
+                "_id": 0,
+                "property_id": 1,
+                "sender_id": 1,
+                "message": 1,
+                "created_at": 1,
+                "seq": 1,
+                "participants": {
+                    "$cond": {
+                        "if": {"$lt": ["$sender_id", "$receiver_id"]},
+                        "then": ["$sender_id", "$receiver_id"],
+                        "else": ["$receiver_id", "$sender_id"]
+                    }
+                },
+                "unread_for": {
+                    "$cond": {
+                        "if": {"$eq": ["$is_read", False]},
+                        "then": "$receiver_id",
+                        "else": None
+                    }
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "property_id": "$property_id",
+                    "participants": "$participants"
+                },
+                "last_message": {"$first": "$message"},
+                "last_message_time": {"$first": "$created_at"},
+                "last_sender_id": {"$first": "$sender_id"},
+                "last_seq": {"$max": "$seq"},
+                "unread_first": {
+                    "$sum": {"$cond": [{"$eq": ["$unread_for", {"$arrayElemAt": ["$participants", 0]}]}, 1, 0]}
+                },
+                "unread_second": {
+                    "$sum": {"$cond": [{"$eq": ["$unread_for", {"$arrayElemAt": ["$participants", 1]}]}, 1, 0]}
+                }
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "id": {"$concat": ["$_id.property_id", ":", first, ":", second]},
+                "property_id": "$_id.property_id",
+                "participants": "$_id.participants",
+                "last_message": 1,
+                "last_message_time": 1,
+                "last_sender_id": 1,
+                # Messages that predate sequence numbers leave this null; $inc needs a number
+                "last_seq": {"$ifNull": ["$last_seq", 0]},
+                "unread": {"$arrayToObject": [[[first, "$unread_first"], [second, "$unread_second"]]]}
+            }
+        }
+    ]
+
+def inbox_pipeline(user_id: str) -> list:
+    """Aggregation over `conversations` that builds a user's inbox summaries"""
+    return [
+        {
+            "$match": {"participants": user_id}
+        },
+        {
+            "$sort": {"last_message_time": -1}
+        },
+        {
+            "$limit": 100
+        },
+        {
+            "$addFields": {
+                "other_user_id": {
+                    "$arrayElemAt": [
+                        {"$filter": {"input": "$participants", "cond": {"$ne": ["$$this", user_id]}}},
+                        0
+                    ]
+                }
+            }
+        },
+        # Join property and other user details in the same round trip instead of
+        # issuing per-conversation find_one calls
+        {
+            "$lookup": {
+                "from": "properties",
+                "localField": "property_id",
+                "foreignField": "id",
+                "pipeline": [
+                    {"$project": {"_id": 0, "title": 1, "image": {"$arrayElemAt": ["$images", 0]}}}
+                ],
+                "as": "property"
+            }
+        },
+        {
+            "$unwind": "$property"
+        },
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "other_user_id",
+                "foreignField": "id",
+                "pipeline": [
+                    {"$project": {"_id": 0, "name": 1}}
+                ],
+                "as": "other_user"
+            }
+        },
+        {
+            "$unwind": "$other_user"
+        }
+    ]
+
+async def record_message_in_conversation(chat: "Chat") -> int:
+    """Fold a new message into its conversation document and allocate its sequence number"""
+    key = conversation_key(chat.property_id, chat.sender_id, chat.receiver_id)
+    update = {
+        "$set": {
+            "last_message": chat.message,
+            "last_message_time": chat.created_at,
+            "last_sender_id": chat.sender_id
+        },
+        "$setOnInsert": {
+            "property_id": chat.property_id,
+            "participants": sorted([chat.sender_id, chat.receiver_id]),
+            f"unread.{chat.sender_id}": 0
+        },
+        "$inc": {f"unread.{chat.receiver_id}": 1, "last_seq": 1}
+    }
+    try:
+        conversation = await db.conversations.find_one_and_update(
+            {"id": key}, update, projection={"_id": 0, "last_seq": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Another request created the conversation concurrently; apply as a plain update
+        conversation = await db.conversations.find_one_and_update(
+            {"id": key}, update, projection={"_id": 0, "last_seq": 1}, return_document=ReturnDocument.AFTER
+        )
+    return conversation["last_seq"]
+
+def contiguous_messages(messages: list, after_seq: int) -> list:
+    """Cut a seq-ordered batch at the first missing sequence number.
+
+    A number is allocated before its message is inserted, so a reader can see
+    seq n+1 while n is still in flight. Stopping at the gap keeps `after_seq`
+    sync exact; a gap older than CHAT_SEQ_GAP_GRACE_SECONDS belongs to a send
+    that never completed and is skipped.
+    """
+    expected = after_seq + 1
+    grace_cutoff = datetime.utcnow() - timedelta(seconds=CHAT_SEQ_GAP_GRACE_SECONDS)
+    for index, message in enumerate(messages):
+        if message["seq"] != expected and message["created_at"] > grace_cutoff:
+            return messages[:index]
+        expected = message["seq"] + 1
+    return messages
+
+async def reconcile_unread_counters() -> int:
+    """Repair per-user unread counters that drifted from the chats collection.
+
+    Counters are read on both sides of the recount, and only ones that held the same
+    value both times are repaired, compare-and-set against that value. A counter that
+    moved during the recount belongs to a message in flight and is left for the next
+    run. This narrows the race rather than closing it: a send whose chat insert lands
+    before the first read but whose increment lands after the compare-and-set still
+    leaves the counter one off. Drift of that kind is repaired by a later run, once
+    the counter is quiet.
+    """
+    async def read_counters() -> dict:
+        return {
+            doc["user_id"]: doc.get("unread_count", 0)
+            async for doc in db.unread_counters.find({}, {"_id": 0, "user_id": 1, "unread_count": 1})
+        }
+
+    before = await read_counters()
+    actual = {
+        doc["_id"]: doc["count"]
+        async for doc in db.chats.aggregate([
+            {"$match": {"is_read": False}},
+            {"$group": {"_id": "$receiver_id", "count": {"$sum": 1}}}
+        ])
+    }
+    after = await read_counters()
+    repaired = 0
+    for user_id in after.keys() | actual.keys():
+        expected = actual.get(user_id, 0)
+        current = after.get(user_id)
+        if current == expected or current != before.get(user_id):
+            continue
+        if current is None:
+            result = await db.unread_counters.update_one(
+                {"user_id": user_id},
+                {"$setOnInsert": {"unread_count": expected}},
+                upsert=True
+            )
+            repaired += 1 if result.upserted_id is not None else 0
+        else:
+            result = await db.unread_counters.update_one(
+                {"user_id": user_id, "unread_count": current},
+                {"$set": {"unread_count": expected}}
+            )
+            repaired += result.modified_count
+    return repaired
+
+async def unread_reconciliation_loop():
+    while True:
+        await asyncio.sleep(UNREAD_RECONCILE_INTERVAL_SECONDS)
+        try:
+            repaired = await reconcile_unread_counters()
+            if repaired:
+                logger.info("Repaired %d drifted unread counters", repaired)
+        except Exception:
+            logger.exception("Unread counter reconciliation failed")
 
 # Chat routes
 @api_router.post("/chat", response_model=Chat)
@@ -309,133 +1397,411 @@ async def send_message(chat_data: ChatCreate, current_user: dict = Depends(get_c
     chat_dict["sender_id"] = current_user["id"]
     
     chat_obj = Chat(**chat_dict)
+    chat_obj.seq = await record_message_in_conversation(chat_obj)
     await db.chats.insert_one(chat_obj.dict())
+    counter = await db.unread_counters.find_one_and_update(
+        {"user_id": chat_obj.receiver_id},
+        {"$inc": {"unread_count": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if counter is None:
+        # No counter yet: start it from the receiver's unread messages, this one included,
+        # so messages that predate the counters are not left out
+        counter = {"unread_count": await initialise_unread_counter(chat_obj.receiver_id)}
+    
+    # Wake long-poll requests parked on this conversation
+    await publish_conversation_changed(conversation_key(chat_obj.property_id, chat_obj.sender_id, chat_obj.receiver_id))
+    
+    # Push the message to both participants' open connections (the sender may have other tabs)
+    message_event = {"type": "message", "message": jsonable_encoder(chat_obj)}
+    await publish_chat_event(chat_obj.receiver_id, message_event)
+    await publish_chat_event(chat_obj.sender_id, message_event)
+    await publish_chat_event(chat_obj.receiver_id, {"type": "unread_count", "unread_count": max(counter["unread_count"], 0)})
     
     return chat_obj
 
 @api_router.get("/chat/conversations", response_model=List[ConversationSummary])
 async def get_user_conversations(current_user: dict = Depends(get_current_user)):
-    # Get all unique (property_id, other_user_id) pairs where user has conversations
-    pipeline = [
-        {
-            "$match": {
-                "$or": [
-                    {"sender_id": current_user["id"]},
-                    {"receiver_id": current_user["id"]}
-                ]
-            }
-        },
-        {
-            "$addFields": {
-                "other_user_id": {
-                    "$cond": {
-                        "if": {"$eq": ["$sender_id", current_user["id"]]},
-                        "then": "$receiver_id",
-                        "else": "$sender_id"
-                    }
-                }
-            }
-        },
-        {
-            "$sort": {"created_at": -1}
-        },
-        {
-            "$group": {
-                "_id": {
-                    "property_id": "$property_id",
-                    "other_user_id": "$other_user_id"
-                },
-                "last_message": {"$first": "$message"},
-                "last_message_time": {"$first": "$created_at"},
-                "sender_id": {"$first": "$sender_id"},
-                "receiver_id": {"$first": "$receiver_id"},
-                "messages": {"$push": "$$ROOT"}
-            }
-        }
-    ]
+    # Conversation state is maintained on write, so the inbox is a single indexed read
+    conversations = await db.conversations.aggregate(inbox_pipeline(current_user["id"])).to_list(length=100)
     
-    conversations = await db.chats.aggregate(pipeline).to_list(length=100)
-    
-    result = []
-    for conv in conversations:
-        property_id = conv["_id"]["property_id"]
-        other_user_id = conv["_id"]["other_user_id"]
-        
-        # Get property details
-        property_doc = await db.properties.find_one({"id": property_id})
-        if not property_doc:
-            continue
-            
-        # Get other user details
-        other_user = await db.users.find_one({"id": other_user_id})
-        if not other_user:
-            continue
-            
-        # Count unread messages for this specific conversation
-        unread_count = await db.chats.count_documents({
-            "property_id": property_id,
-            "receiver_id": current_user["id"],
-            "sender_id": other_user_id,
-            "is_read": False
-        })
-        
-        result.append(ConversationSummary(
-            property_id=property_id,
-            property_title=property_doc["title"],
-            property_image=property_doc["images"][0] if property_doc.get("images") else None,
-            other_user_id=other_user_id,
-            other_user_name=other_user["name"],
+    return [
+        ConversationSummary(
+            property_id=conv["property_id"],
+            property_title=conv["property"]["title"],
+            property_image=image_variant_url(conv["property"].get("image"), "thumb"),
+            other_user_id=conv["other_user_id"],
+            other_user_name=conv["other_user"]["name"],
             last_message=conv["last_message"],
             last_message_time=conv["last_message_time"],
-            unread_count=unread_count,
-            is_sender=conv["sender_id"] == current_user["id"]
-        ))
-    
-    return result
+            unread_count=max(conv.get("unread", {}).get(current_user["id"], 0), 0),
+            is_sender=conv["last_sender_id"] == current_user["id"]
+        )
+        for conv in conversations
+    ]
 
-@api_router.get("/chat/unread-count")
-async def get_unread_count(current_user: dict = Depends(get_current_user)):
+async def initialise_unread_counter(user_id: str) -> int:
+    """Create a missing unread counter from the user's unread messages and return its value"""
     count = await db.chats.count_documents({
-        "receiver_id": current_user["id"],
+        "receiver_id": user_id,
         "is_read": False
     })
-    return {"unread_count": count}
+    # If another request created the counter meanwhile, theirs is kept
+    counter = await db.unread_counters.find_one_and_update(
+        {"user_id": user_id},
+        {"$setOnInsert": {"unread_count": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return max(counter["unread_count"], 0)
+
+async def current_unread_count(user_id: str) -> int:
+    # Counters are maintained by send_message and the mark-read routes, so this is a single small read
+    counter = await db.unread_counters.find_one({"user_id": user_id})
+    if counter is None:
+        # First request for a user whose messages predate the counters
+        return await initialise_unread_counter(user_id)
+    return max(counter["unread_count"], 0)
+
+@api_router.get("/chat/unread-count")
+async def get_unread_count(current_user: dict = Depends(get_current_user)):
+    return {"unread_count": await current_unread_count(current_user["id"])}
 
 @api_router.post("/chat/mark-read")
 async def mark_messages_read(chat_data: ChatMarkRead, current_user: dict = Depends(get_current_user)):
-    # Mark messages as read for the current user
-    await db.chats.update_many(
+    # Group the still-unread messages by conversation so each conversation's
+    # unread counter is decremented by exactly the number of messages flipped
+    unread_messages = await db.chats.find(
         {
             "id": {"$in": chat_data.message_ids},
-            "receiver_id": current_user["id"]
+            "receiver_id": current_user["id"],
+            "is_read": False
         },
-        {
-            "$set": {
-                "is_read": True,
-                "read_at": datetime.utcnow()
+        {"_id": 0, "id": 1, "property_id": 1, "sender_id": 1}
+    ).to_list(length=None)
+    
+    by_conversation = {}
+    for msg in unread_messages:
+        by_conversation.setdefault((msg["property_id"], msg["sender_id"]), []).append(msg["id"])
+    
+    # Mark messages as read for the current user
+    read_at = datetime.utcnow()
+    total_marked = 0
+    for (property_id, sender_id), message_ids in by_conversation.items():
+        result = await db.chats.update_many(
+            {
+                "id": {"$in": message_ids},
+                "receiver_id": current_user["id"],
+                "is_read": False
+            },
+            {
+                "$set": {
+                    "is_read": True,
+                    "read_at": read_at
+                }
             }
+        )
+        if result.modified_count:
+            total_marked += result.modified_count
+            await db.conversations.update_one(
+                {"id": conversation_key(property_id, sender_id, current_user["id"])},
+                {"$inc": {f"unread.{current_user['id']}": -result.modified_count}}
+            )
+            # Read receipt for the other participant
+            await publish_chat_event(sender_id, {
+                "type": "read",
+                "property_id": property_id,
+                "reader_id": current_user["id"],
+                "message_ids": message_ids,
+                "read_at": jsonable_encoder(read_at)
+            })
+    if total_marked:
+        counter = await db.unread_counters.find_one_and_update(
+            {"user_id": current_user["id"]},
+            {"$inc": {"unread_count": -total_marked}},
+            return_document=ReturnDocument.AFTER
+        )
+        if counter is not None:
+            await publish_chat_event(current_user["id"], {"type": "unread_count", "unread_count": max(counter["unread_count"], 0)})
+    return {"message": "Messages marked as read"}
+
+@api_router.post("/chat/conversations/mark-read")
+async def mark_conversation_read(chat_data: ConversationMarkRead, current_user: dict = Depends(get_current_user)):
+    # One update_many over the conversation's incoming messages instead of a client-supplied id list
+    if chat_data.up_to_seq is not None and chat_data.up_to is not None:
+        raise HTTPException(status_code=400, detail="Use either up_to_seq or up_to, not both")
+    query = {
+        "property_id": chat_data.property_id,
+        "sender_id": chat_data.other_user_id,
+        "receiver_id": current_user["id"],
+        "is_read": False
+    }
+    if chat_data.up_to_seq is not None:
+        # Messages that predate sequence numbers (seq null) are older than any numbered one.
+        # Each branch repeats the whole filter so both are scans on the unread-messages index.
+        query = {"$or": [{**query, "seq": {"$lte": chat_data.up_to_seq}}, {**query, "seq": None}]}
+    elif chat_data.up_to is not None:
+        query["created_at"] = {"$lte": chat_data.up_to}
+    
+    read_at = datetime.utcnow()
+    result = await db.chats.update_many(query, {"$set": {"is_read": True, "read_at": read_at}})
+    if not result.modified_count:
+        return {"marked": 0, "unread_count": await current_unread_count(current_user["id"])}
+    
+    await db.conversations.update_one(
+        {"id": conversation_key(chat_data.property_id, chat_data.other_user_id, current_user["id"])},
+        {"$inc": {f"unread.{current_user['id']}": -result.modified_count}}
+    )
+    # Read receipt for the other participant, naming the range rather than every message id
+    await publish_chat_event(chat_data.other_user_id, {
+        "type": "read",
+        "property_id": chat_data.property_id,
+        "reader_id": current_user["id"],
+        "up_to_seq": chat_data.up_to_seq,
+        "up_to": jsonable_encoder(chat_data.up_to),
+        "read_at": jsonable_encoder(read_at)
+    })
+    counter = await db.unread_counters.find_one_and_update(
+        {"user_id": current_user["id"]},
+        {"$inc": {"unread_count": -result.modified_count}},
+        return_document=ReturnDocument.AFTER
+    )
+    if counter is None:
+        unread_count = await current_unread_count(current_user["id"])
+    else:
+        unread_count = max(counter["unread_count"], 0)
+        await publish_chat_event(current_user["id"], {"type": "unread_count", "unread_count": unread_count})
+    return {"marked": result.modified_count, "unread_count": unread_count}
+
+def format_stream_event(user_id: str, seq: int, event: dict) -> Optional[str]:
+    """Render a hub event for the event stream, which carries unread counts and conversation changes"""
+    if event["type"] == "unread_count":
+        name, data = "unread_count", {"unread_count": event["unread_count"]}
+    elif event["type"] == "message":
+        message = event["message"]
+        name, data = "conversation_updated", {
+            "property_id": message["property_id"],
+            "other_user_id": message["receiver_id"] if message["sender_id"] == user_id else message["sender_id"],
+            "last_message": message["message"],
+            "last_message_time": message["created_at"]
+        }
+    elif event["type"] == "read":
+        name, data = "conversation_updated", {
+            "property_id": event["property_id"],
+            "other_user_id": event["reader_id"]
         }
+    else:
+        return None
+    return f"id: {chat_hub.event_id(seq)}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+
+@api_router.get("/chat/events")
+async def stream_chat_events(
+    session: dict = Depends(get_stream_session),
+    last_event_id: Optional[str] = Header(None)
+):
+    user_id = session["user"]["id"]
+    
+    async def event_stream():
+        # Subscribe before replaying so nothing published in between is missed
+        queue = chat_hub.subscribe(user_id, session["session_id"])
+        try:
+            yield "retry: 3000\n\n"
+            replayed_up_to = 0
+            if last_event_id:
+                missed = chat_hub.replay(user_id, last_event_id)
+                if missed is None:
+                    # Events were lost (restart, another worker, or too old); the client must refetch
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    for seq, event in missed:
+                        replayed_up_to = seq
+                        chunk = format_stream_event(user_id, seq, event)
+                        if chunk:
+                            yield chunk
+            while True:
+                remaining = session["expires_at"] - time.time()
+                if remaining <= 0:
+                    # The token has expired; the client reconnects with a refreshed one
+                    yield "event: reauthenticate\ndata: {}\n\n"
+                    return
+                try:
+                    seq, event = await asyncio.wait_for(queue.get(), timeout=min(SSE_HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    # The session was revoked
+                    yield "event: reauthenticate\ndata: {}\n\n"
+                    return
+                if seq <= replayed_up_to:
+                    continue
+                chunk = format_stream_event(user_id, seq, event)
+                if chunk:
+                    yield chunk
+        finally:
+            chat_hub.unsubscribe(user_id, queue, session["session_id"])
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    return {"message": "Messages marked as read"}
 
 @api_router.get("/chat/{property_id}")
-async def get_chat_messages(property_id: str, other_user_id: str, current_user: dict = Depends(get_current_user)):
+async def get_chat_messages(
+    property_id: str,
+    other_user_id: str,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    after_seq: Optional[int] = None,
+    limit: int = 100,
+    current_user: dict = Depends(get_current_user)
+):
+    # Keyset pagination over (created_at, id): without a cursor the newest page is returned,
+    # `before` walks back through older history and `after` fetches anything newer.
+    # `after_seq` is the exact sync delta: every message with a higher sequence number, in order.
+    if sum(param is not None for param in (before, after, after_seq)) > 1:
+        raise HTTPException(status_code=400, detail="Use only one of before, after or after_seq")
+    limit = min(max(limit, 1), 100)
+    
+    if after_seq is not None:
+        messages = await db.chats.find(
+            conversation_query(property_id, current_user["id"], other_user_id, {"seq": {"$gt": after_seq}})
+        ).sort("seq", 1).limit(limit).to_list(length=limit)
+        return [Chat(**msg) for msg in contiguous_messages(messages, after_seq)]
+    
+    keyset = {}
+    newest_first = after is None
+    if before or after:
+        cursor = decode_cursor(before or after)
+        try:
+            created_at, message_id = datetime.fromisoformat(cursor["t"]), cursor["id"]
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if before:
+            keyset = {
+                "created_at": {"$lte": created_at},
+                "$or": [{"created_at": {"$lt": created_at}}, {"id": {"$lt": message_id}}]
+            }
+        else:
+            keyset = {
+                "created_at": {"$gte": created_at},
+                "$or": [{"created_at": {"$gt": created_at}}, {"id": {"$gt": message_id}}]
+            }
+    
     # Get messages for this property between current user and the other user only
-    messages = await db.chats.find({
-        "property_id": property_id,
-        "$or": [
-            {"sender_id": current_user["id"], "receiver_id": other_user_id},
-            {"sender_id": other_user_id, "receiver_id": current_user["id"]}
-        ]
-    }).sort("created_at", 1).to_list(length=100)
+    direction = -1 if newest_first else 1
+    messages = await db.chats.find(
+        conversation_query(property_id, current_user["id"], other_user_id, keyset)
+    ).sort([("created_at", direction), ("id", direction)]).limit(limit).to_list(length=limit)
+    if newest_first:
+        messages.reverse()
+    
+    if messages:
+        oldest, newest = messages[0], messages[-1]
+        response.headers["X-After-Cursor"] = encode_cursor({"t": newest["created_at"].isoformat(), "id": newest["id"]})
+        if len(messages) == limit or after:
+            response.headers["X-Before-Cursor"] = encode_cursor({"t": oldest["created_at"].isoformat(), "id": oldest["id"]})
+    elif after:
+        # Nothing newer yet; keep polling from the same position
+        response.headers["X-After-Cursor"] = after
+    
+    return [Chat(**msg) for msg in messages]
+
+@api_router.get("/chat/{property_id}/poll")
+async def poll_chat_messages(
+    property_id: str,
+    other_user_id: str,
+    since: Optional[datetime] = None,
+    after_seq: Optional[int] = None,
+    timeout: float = 25,
+    current_user: dict = Depends(get_current_user)
+):
+    # Return only messages newer than `since` (or after `after_seq`), parking the request
+    # until one arrives or the timeout expires
+    if after_seq is not None:
+        query = conversation_query(property_id, current_user["id"], other_user_id, {"seq": {"$gt": after_seq}})
+        sort_field = "seq"
+    elif since is not None:
+        query = conversation_query(property_id, current_user["id"], other_user_id, {"created_at": {"$gt": since}})
+        sort_field = "created_at"
+    else:
+        # Without a cursor every poll would return the oldest page; load history from GET /chat/{property_id} first
+        raise HTTPException(status_code=422, detail="Polling requires since or after_seq")
+    
+    async def fetch():
+        messages = await db.chats.find(query).sort(sort_field, 1).to_list(length=100)
+        return messages if after_seq is None else contiguous_messages(messages, after_seq)
+    
+    key = conversation_key(property_id, current_user["id"], other_user_id)
+    # Watch before querying so a message posted in between still wakes this request
+    changed = chat_hub.watch_conversation(key)
+    try:
+        messages = await fetch()
+        if not messages:
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=min(max(timeout, 0), LONG_POLL_MAX_SECONDS))
+            except asyncio.TimeoutError:
+                return []
+            messages = await fetch()
+    finally:
+        chat_hub.unwatch_conversation(key, changed)
     
     return [Chat(**msg) for msg in messages]
 
+# Real-time chat events
+@api_router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: str):
+    # Browsers cannot set an Authorization header on WebSocket requests, so the token comes as a query parameter
+    try:
+        session = await stream_session(token)
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
+    
+    await websocket.accept()
+    user = session["user"]
+    queue = chat_hub.subscribe(user["id"], session["session_id"])
+    
+    async def forward_events():
+        while True:
+            try:
+                _, event = await asyncio.wait_for(queue.get(), timeout=max(session["expires_at"] - time.time(), 0))
+            except asyncio.TimeoutError:
+                event = None
+            if event is None:
+                # The token expired or the session was revoked; the client reconnects with a refreshed token
+                await websocket.close(code=4401)
+                return
+            await websocket.send_json(event)
+    
+    forwarder = asyncio.create_task(forward_events())
+    try:
+        # Clients do not send anything; reading only detects the disconnect
+        while True:
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the forwarder closed the socket while this read was pending
+        pass
+    finally:
+        forwarder.cancel()
+        chat_hub.unsubscribe(user["id"], queue, session["session_id"])
+
 # Basic test route
 @api_router.get("/")
 async def root():
     return {"message": "FindMeRoom API is running"}
 
+@api_router.get("/metrics")
+async def metrics():
+    return {
+        "password_hashing": password_hasher.stats(),
+        "principal_cache": principal_cache.stats(),
+        "jwt_cache": jwt_cache.stats(),
+        "revoked_sessions": {"entries": revoked_sessions.count, "capacity": revoked_sessions.capacity}
+    }
+
 # Include the router in the main app
 app.include_router(api_router) 
     
@@ -445,6 +1811,7 @@ app.add_middleware(
     allow_origins=["http://localhost:3000"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Before-Cursor", "X-After-Cursor", "X-Next-Cursor"],
 )
 
 # Configure logging
@@ -454,6 +1821,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    # Indexes are declared in indexes.py; only missing ones are built here
+    report = await apply_indexes(db)
+    unenforced, failed = {}, []
+    for collection, drift in report.items():
+        # Unique indexes enforce correctness (e.g. registration has no duplicate lookup), so running without them is refused
+        models = [model for _, model in drift["changed"]] + [model for model, _ in drift["failed"]]
+        models = [model for model in models if model.document.get("unique")]
+        if models:
+            unenforced[collection] = models
+        failed += [error for model, error in drift["failed"] if not model.document.get("unique")]
+        if drift["changed"] or drift["extra"]:
+            logger.warning("Index drift on %s; run `python manage.py check-indexes`", collection)
+    # Raised only once every other collection has had its indexes built
+    if unenforced:
+        keys = "; ".join(
+            f"{collection} " + ", ".join(describe(key_pattern(model.document["key"]), index_options(model.document)) for model in models)
+            for collection, models in unenforced.items()
+        )
+        raise RuntimeError(
+            f"Unique index missing: {keys}; run `python manage.py find-duplicate-users`, "
+            "resolve any duplicates, then `python manage.py check-indexes --fix`"
+        )
+    if failed:
+        raise failed[0]
+
+@app.on_event("startup")
+async def start_revocation_reload():
+    await load_revocations()
+    app.state.revocation_reload = asyncio.create_task(revocation_reload_loop())
+
+@app.on_event("startup")
+async def start_unread_reconciliation():
+    app.state.unread_reconciliation = asyncio.create_task(unread_reconciliation_loop())
+
+@app.on_event("startup")
+async def start_chat_broker():
+    await chat_broker.start(dispatch_broker_message)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.unread_reconciliation.cancel()
+    app.state.revocation_reload.cancel()
+    shutdown_image_pool()
+    password_hasher.shutdown()
+    await chat_broker.stop()
     client.close()
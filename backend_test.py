@@ -985,6 +985,69 @@ class FindMeRoomTester:
         else:
             self.log_result("Mark Messages Read (No Auth)", False, "Should reject unauthenticated request")
 
+    def test_chat_conversation_mark_read_endpoint(self):
+        """Test /api/chat/conversations/mark-read endpoint"""
+        print("\n=== Testing Conversation Mark Read Endpoint ===")
+        
+        if len(self.auth_tokens) < 2 or not self.test_properties:
+            self.log_result("Conversation Mark Read", False, "Need 2 users and a property for conversation mark read testing")
+            return
+        
+        sender_token = self.auth_tokens[list(self.auth_tokens.keys())[0]]
+        receiver_token = self.auth_tokens[list(self.auth_tokens.keys())[1]]
+        sender_user = self.make_request("GET", "/auth/me", auth_token=sender_token)[0].json()
+        receiver_user = self.make_request("GET", "/auth/me", auth_token=receiver_token)[0].json()
+        property_id = self.test_properties[0]["id"]
+        
+        sent = []
+        for i in range(3):
+            response, error = self.make_request("POST", "/chat", {
+                "property_id": property_id,
+                "receiver_id": receiver_user["id"],
+                "message": f"Conversation mark read test {i}"
+            }, sender_token)
+            if error or response.status_code != 200:
+                self.log_result("Conversation Mark Read", False, "Could not send test messages")
+                return
+            sent.append(response.json())
+        
+        # Mark up to the second message by sequence number
+        mark_data = {"property_id": property_id, "other_user_id": sender_user["id"], "up_to_seq": sent[1]["seq"]}
+        response, error = self.make_request("POST", "/chat/conversations/mark-read", mark_data, receiver_token)
+        if error or response.status_code != 200:
+            self.log_result("Conversation Mark Read (Up To Seq)", False, error or f"HTTP {response.status_code}")
+            return
+        data = response.json()
+        unread_response, _ = self.make_request("GET", "/chat/unread-count", auth_token=receiver_token)
+        if data.get("marked", 0) >= 2 and data.get("unread_count") == unread_response.json()["unread_count"]:
+            self.log_result("Conversation Mark Read (Up To Seq)", True, f"Marked {data['marked']} messages, {data['unread_count']} unread")
+        else:
+            self.log_result("Conversation Mark Read (Up To Seq)", False, f"Unexpected response: {data}")
+        
+        # The third message is still unread; marking the whole conversation catches it
+        mark_data = {"property_id": property_id, "other_user_id": sender_user["id"]}
+        response, error = self.make_request("POST", "/chat/conversations/mark-read", mark_data, receiver_token)
+        if not error and response.status_code == 200 and response.json().get("marked") == 1:
+            self.log_result("Conversation Mark Read (Whole Conversation)", True, "Marked the remaining message")
+        else:
+            self.log_result("Conversation Mark Read (Whole Conversation)", False, "Should mark exactly the remaining message")
+        
+        # Conflicting positions
+        mark_data = {"property_id": property_id, "other_user_id": sender_user["id"], "up_to_seq": 1, "up_to": sent[0]["created_at"]}
+        response, error = self.make_request("POST", "/chat/conversations/mark-read", mark_data, receiver_token)
+        if not error and response.status_code == 400:
+            self.log_result("Conversation Mark Read (Both Positions)", True, "Correctly rejected up_to_seq with up_to")
+        else:
+            self.log_result("Conversation Mark Read (Both Positions)", False, "Should reject up_to_seq together with up_to")
+        
+        # HTTPBearer answers a missing Authorization header with 403 here; newer FastAPI releases answer 401
+        # HTTPBearer answers a missing Authorization header with 403 (401 from FastAPI 0.115 on)
+        response, error = self.make_request("POST", "/chat/conversations/mark-read", {"property_id": property_id, "other_user_id": sender_user["id"]})
+        if not error and response.status_code in (401, 403):
+            self.log_result("Conversation Mark Read (No Auth)", True, "Correctly rejected unauthenticated request")
+        else:
+            self.log_result("Conversation Mark Read (No Auth)", False, "Should reject unauthenticated request")
+
     def test_chat_unread_count_endpoint(self):
         """Test /api/chat/unread-count endpoint"""
         print("\n=== Testing Chat Unread Count Endpoint ===")
@@ -1314,6 +1377,7 @@ class FindMeRoomTester:
         self.test_enhanced_chat_system()
         self.test_chat_conversations_endpoint()
         self.test_chat_mark_read_endpoint()
+        self.test_chat_conversation_mark_read_endpoint()
         self.test_chat_unread_count_endpoint()
         self.test_chat_edge_cases()
         self.test_chat_conversation_isolation()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Multi-worker integration test for the Unix-domain-socket chat broker
+Starts several worker processes on localhost and checks cross-worker fan-out and relay failover
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from chat_broker import UnixSocketBroker  # noqa: E402
+
+WORKERS = 4
+DELIVERY_TIMEOUT = 5
+
+def run_worker(worker_id: int, socket_path: str, commands, received):
+    """Worker process: publishes what it is told to and reports everything it receives"""
+
+    async def main():
+        broker = UnixSocketBroker(socket_path)
+        await broker.start(lambda message: received.put((worker_id, message)))
+        await broker.wait_connected()
+        received.put((worker_id, {"kind": "ready"}))
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await loop.run_in_executor(None, commands.get)
+            if command is None:
+                break
+            await broker.publish(command)
+        await broker.stop()
+
+    asyncio.run(main())
+
+class ChatBrokerTest:
+    def __init__(self):
+        self.socket_path = str(Path(tempfile.mkdtemp()) / "chat.sock")
+        self.received = multiprocessing.Queue()
+        self.commands = {}
+        self.workers = {}
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def start_worker(self, worker_id: int):
+        self.commands[worker_id] = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(worker_id, self.socket_path, self.commands[worker_id], self.received),
+            daemon=True
+        )
+        process.start()
+        self.workers[worker_id] = process
+        self.wait_for(lambda w, m: w == worker_id and m["kind"] == "ready", 1)
+
+    def wait_for(self, predicate, count: int) -> list:
+        """Collect `count` received messages matching predicate, ignoring the rest"""
+        matched = []
+        deadline = time.time() + DELIVERY_TIMEOUT
+        while len(matched) < count and time.time() < deadline:
+            try:
+                worker_id, message = self.received.get(timeout=max(deadline - time.time(), 0.01))
+            except queue.Empty:
+                break
+            if predicate(worker_id, message):
+                matched.append((worker_id, message))
+        return matched
+
+    def publish_and_collect(self, publisher: int, label: str) -> set:
+        message = {"kind": "user_event", "user_id": "test-user", "event": {"type": "probe", "label": label}}
+        self.commands[publisher].put(message)
+        expected = len(self.workers)
+        received = self.wait_for(lambda w, m: m.get("event", {}).get("label") == label, expected)
+        # Give any duplicate deliveries a moment to show up
+        received += self.wait_for(lambda w, m: m.get("event", {}).get("label") == label, 1) if len(received) == expected else []
+        return [worker_id for worker_id, _ in received]
+
+    def test_fan_out(self):
+        print("\n=== Testing cross-worker fan-out ===")
+        for publisher in list(self.workers):
+            receivers = self.publish_and_collect(publisher, f"fanout-{publisher}")
+            self.log_result(
+                f"Fan-out From Worker {publisher}",
+                sorted(receivers) == sorted(self.workers),
+                f"Delivered to workers {sorted(receivers)}"
+            )
+
+    def test_relay_failover(self):
+        print("\n=== Testing relay failover ===")
+        # Worker 0 started first, so it hosts the relay
+        self.workers[0].kill()
+        self.workers[0].join()
+        del self.workers[0]
+        # Survivors reconnect once a new host has taken over
+        time.sleep(1)
+        publisher = min(self.workers)
+        receivers = self.publish_and_collect(publisher, "after-failover")
+        self.log_result(
+            "Fan-out After Relay Host Dies",
+            sorted(receivers) == sorted(self.workers),
+            f"Delivered to workers {sorted(receivers)}"
+        )
+
+    def run_all_tests(self):
+        print("🚀 Starting Chat Broker Multi-Worker Test")
+        print(f"📍 Relay socket: {self.socket_path}")
+        print("=" * 70)
+        try:
+            for worker_id in range(WORKERS):
+                self.start_worker(worker_id)
+            self.test_fan_out()
+            self.test_relay_failover()
+        finally:
+            for worker_id, process in self.workers.items():
+                self.commands[worker_id].put(None)
+                process.join(timeout=2)
+                if process.is_alive():
+                    process.kill()
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = ChatBrokerTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark for cursor-based pagination of GET /api/chat/{property_id}
+Seeds a 100k-message thread and checks that deep pages cost the same as the newest page
+"""
+
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+load_dotenv(Path(__file__).parent / "backend" / ".env")
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+HEADERS = {"Content-Type": "application/json"}
+
+THREAD_LENGTH = 100_000
+PAGE_SIZE = 100
+BATCH_SIZE = 10_000
+# p50 of the deepest pages may be at most this many times the p50 of the newest pages
+MAX_DEPTH_RATIO = 2.0
+
+class ChatPaginationBenchmark:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.headers = HEADERS.copy()
+        self.db = MongoClient(os.environ["MONGO_URL"])[os.environ["DB_NAME"]]
+        self.tokens = {}
+        self.user_ids = {}
+        self.property_id = None
+
+    def register(self, label: str):
+        timestamp = str(int(time.time() * 1000))
+        user_data = {
+            "email": f"pages.{label}.{timestamp}@example.com",
+            "name": f"Pages {label.title()}",
+            "phone": f"7{timestamp[-9:]}",
+            "password": "pagespass123"
+        }
+        response = requests.post(f"{self.base_url}/auth/register", headers=self.headers, json=user_data)
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not register {label}: {response.text}")
+        data = response.json()
+        self.tokens[label] = data["access_token"]
+        self.user_ids[label] = data["user"]["id"]
+        time.sleep(0.01)
+
+    def seed(self):
+        print(f"\n=== Seeding a {THREAD_LENGTH}-message thread ===")
+        self.register("landlord")
+        self.register("tenant")
+        headers = {**self.headers, "Authorization": f"Bearer {self.tokens['landlord']}"}
+        response = requests.post(f"{self.base_url}/properties", headers=headers, json={
+            "title": "Pagination Benchmark Room",
+            "description": "Room created by the chat pagination benchmark",
+            "property_type": "room",
+            "rent": 5000,
+            "deposit": 10000,
+            "location": "Pager Street",
+            "city": "Pager City",
+            "images": [],
+            "amenities": []
+        })
+        self.property_id = response.json()["id"]
+
+        started = datetime.utcnow() - timedelta(seconds=THREAD_LENGTH)
+        landlord, tenant = self.user_ids["landlord"], self.user_ids["tenant"]
+        for offset in range(0, THREAD_LENGTH, BATCH_SIZE):
+            self.db.chats.insert_many([
+                {
+                    "id": str(uuid.uuid4()),
+                    "property_id": self.property_id,
+                    "sender_id": tenant if i % 2 else landlord,
+                    "receiver_id": landlord if i % 2 else tenant,
+                    "message": f"Benchmark message {i}",
+                    "is_read": True,
+                    "read_at": None,
+                    "created_at": started + timedelta(seconds=i)
+                }
+                for i in range(offset, min(offset + BATCH_SIZE, THREAD_LENGTH))
+            ])
+
+    def fetch_page(self, before=None):
+        params = {"other_user_id": self.user_ids["landlord"], "limit": PAGE_SIZE}
+        if before:
+            params["before"] = before
+        headers = {**self.headers, "Authorization": f"Bearer {self.tokens['tenant']}"}
+        start = time.perf_counter()
+        response = requests.get(f"{self.base_url}/chat/{self.property_id}", headers=headers, params=params)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            raise RuntimeError(f"Page request failed: {response.text}")
+        return response.json(), response.headers.get("X-Before-Cursor"), elapsed
+
+    def walk_history(self):
+        print("\n=== Walking the whole thread newest-first ===")
+        timings = []
+        seen = 0
+        cursor = None
+        newest_first_page = None
+        while True:
+            messages, cursor, elapsed = self.fetch_page(cursor)
+            if newest_first_page is None:
+                newest_first_page = messages
+            timings.append(elapsed)
+            seen += len(messages)
+            if not cursor:
+                break
+        return timings, seen, newest_first_page
+
+    def cleanup(self):
+        print("\n=== Cleaning up benchmark data ===")
+        self.db.chats.delete_many({"property_id": self.property_id})
+        headers = {**self.headers, "Authorization": f"Bearer {self.tokens['landlord']}"}
+        requests.delete(f"{self.base_url}/properties/{self.property_id}", headers=headers)
+
+    def run_benchmark(self) -> bool:
+        print("🚀 Starting Chat Pagination Benchmark")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+        self.seed()
+        try:
+            timings, seen, first_page = self.walk_history()
+        finally:
+            self.cleanup()
+
+        window = max(len(timings) // 10, 1)
+        newest = statistics.median(timings[:window])
+        deepest = statistics.median(timings[-window:])
+        ratio = deepest / newest if newest > 0 else float("inf")
+        newest_ok = first_page[-1]["message"] == f"Benchmark message {THREAD_LENGTH - 1}"
+        complete = seen == THREAD_LENGTH
+
+        print("\n" + "=" * 70)
+        print("🏁 BENCHMARK SUMMARY")
+        print("=" * 70)
+        print(f"📊 Pages fetched: {len(timings)}, messages seen: {seen}/{THREAD_LENGTH}")
+        print(f"📊 Newest pages p50 {newest:.2f} ms, deepest pages p50 {deepest:.2f} ms ({ratio:.2f}x)")
+        print(f"{'✅' if newest_ok else '❌'} First page ends with the newest message")
+        print(f"{'✅' if complete else '❌'} Every message returned exactly once")
+        passed = newest_ok and complete and ratio <= MAX_DEPTH_RATIO
+        if passed:
+            print(f"✅ PASS: deep pages cost the same as the newest page (<= {MAX_DEPTH_RATIO}x)")
+        else:
+            print(f"❌ FAIL: expected complete, newest-first pages within {MAX_DEPTH_RATIO}x")
+        return passed
+
+if __name__ == "__main__":
+    benchmark = ChatPaginationBenchmark()
+    benchmark.run_benchmark()
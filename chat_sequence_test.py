@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for per-conversation chat sequence numbers
+Sends messages from both participants at once and checks the numbers are gap-free and after_seq deltas are exact
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+HEADERS = {"Content-Type": "application/json"}
+
+MESSAGES = 200
+CONCURRENCY = 32
+
+class ChatSequenceTest:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.headers = HEADERS.copy()
+        self.tokens = {}
+        self.user_ids = {}
+        self.property_id = None
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def auth(self, label: str) -> dict:
+        return {**self.headers, "Authorization": f"Bearer {self.tokens[label]}"}
+
+    def register(self, label: str):
+        timestamp = str(int(time.time() * 1000))
+        user_data = {
+            "email": f"seq.{label}.{timestamp}@example.com",
+            "name": f"Seq {label.title()}",
+            "phone": f"6{timestamp[-9:]}",
+            "password": "seqtestpass123"
+        }
+        response = requests.post(f"{self.base_url}/auth/register", headers=self.headers, json=user_data)
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not register {label}: {response.text}")
+        data = response.json()
+        self.tokens[label] = data["access_token"]
+        self.user_ids[label] = data["user"]["id"]
+        time.sleep(0.01)
+
+    def setup(self):
+        print("\n=== Registering test users ===")
+        self.register("landlord")
+        self.register("tenant")
+        response = requests.post(f"{self.base_url}/properties", headers=self.auth("landlord"), json={
+            "title": "Sequence Test Room",
+            "description": "Room created by the chat sequence test",
+            "property_type": "room",
+            "rent": 5000,
+            "deposit": 10000,
+            "location": "Seq Street",
+            "city": "Seq City",
+            "images": [],
+            "amenities": []
+        })
+        self.property_id = response.json()["id"]
+
+    def send(self, i: int) -> dict:
+        sender, receiver = ("tenant", "landlord") if i % 2 else ("landlord", "tenant")
+        response = requests.post(f"{self.base_url}/chat", headers=self.auth(sender), json={
+            "property_id": self.property_id,
+            "receiver_id": self.user_ids[receiver],
+            "message": f"Sequence message {i}"
+        })
+        return response.json()
+
+    def fetch_after(self, after_seq: int) -> list:
+        messages = []
+        while True:
+            response = requests.get(f"{self.base_url}/chat/{self.property_id}", headers=self.auth("tenant"), params={
+                "other_user_id": self.user_ids["landlord"],
+                "after_seq": after_seq
+            })
+            page = response.json()
+            if not page:
+                return messages
+            messages += page
+            after_seq = page[-1]["seq"]
+
+    def test_concurrent_sends(self):
+        print(f"\n=== Sending {MESSAGES} messages from both sides at once ===")
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            sent = list(pool.map(self.send, range(MESSAGES)))
+        seqs = sorted(message.get("seq") or 0 for message in sent)
+        self.log_result(
+            "Sequence Numbers Are Gap-Free",
+            seqs == list(range(1, MESSAGES + 1)),
+            f"Got {len(set(seqs))} distinct numbers from {seqs[0]} to {seqs[-1]}"
+        )
+
+    def test_after_seq_delta(self):
+        print("\n=== Testing after_seq sync ===")
+        full = self.fetch_after(0)
+        self.log_result(
+            "Full Sync Returns Every Message In Order",
+            [m["seq"] for m in full] == list(range(1, MESSAGES + 1)),
+            f"Synced {len(full)} messages"
+        )
+        delta = self.fetch_after(MESSAGES - 5)
+        self.log_result(
+            "Delta Sync Returns Only Newer Messages",
+            [m["seq"] for m in delta] == list(range(MESSAGES - 4, MESSAGES + 1)),
+            f"Got seqs {[m['seq'] for m in delta]}"
+        )
+        replay = self.fetch_after(MESSAGES - 5)
+        self.log_result(
+            "Replaying A Delta Is Idempotent",
+            [m["id"] for m in replay] == [m["id"] for m in delta]
+        )
+
+    def run_all_tests(self):
+        print("🚀 Starting Chat Sequence Test")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+        self.setup()
+        try:
+            self.test_concurrent_sends()
+            self.test_after_seq_delta()
+        finally:
+            requests.delete(f"{self.base_url}/properties/{self.property_id}", headers=self.auth("landlord"))
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = ChatSequenceTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
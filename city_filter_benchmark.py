@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Before/after benchmark for the GET /api/properties city filter at 1M listings
+Compares the old unanchored case-insensitive regex on `city` with the indexed `city_key` exact and prefix queries
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from pymongo import MongoClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from indexes import INDEXES  # noqa: E402
+from server import normalize_city, properties_query  # noqa: E402
+
+MONGO_URL = os.environ["MONGO_URL"]
+BENCH_DB = f"{os.environ['DB_NAME']}_city_benchmark"
+
+LISTINGS = 1_000_000
+BATCH_SIZE = 10_000
+RUNS = 30
+PAGE_SIZE = 20
+# Weighted so there are both very common and rare cities
+CITIES = [("Mumbai", 30), ("Delhi", 25), ("Bengaluru", 20), ("Pune", 12), ("Hyderabad", 8), ("Chennai", 4.9), ("Shimla", 0.1)]
+
+# (label, city, city_match): what a user asks for
+SCENARIOS = [
+    ("common city", "mumbai", "exact"),
+    ("rare city", "Shimla", "exact"),
+    ("no such city", "Atlantis", "exact"),
+    ("city prefix", "Hyd", "prefix"),
+]
+
+def regex_query(city: str) -> dict:
+    """The filter get_properties built before city_key existed"""
+    return {"available": True, "city": {"$regex": city, "$options": "i"}}
+
+class CityFilterBenchmark:
+    def __init__(self):
+        self.db = MongoClient(MONGO_URL)[BENCH_DB]
+
+    def seed(self):
+        print(f"\n=== Seeding {LISTINGS} listings ===")
+        random.seed(14)
+        names = [name for name, _ in CITIES]
+        weights = [weight for _, weight in CITIES]
+        now = datetime.utcnow()
+        for offset in range(0, LISTINGS, BATCH_SIZE):
+            batch = []
+            for _ in range(BATCH_SIZE):
+                city = random.choices(names, weights)[0]
+                batch.append({
+                    "id": str(uuid.uuid4()),
+                    "user_id": str(uuid.uuid4()),
+                    "title": "Benchmark listing",
+                    "description": "Seeded by the city filter benchmark",
+                    "property_type": random.choice(["room", "house", "pg"]),
+                    "rent": random.randrange(2000, 60000, 500),
+                    "deposit": 10000,
+                    "location": "Benchmark Road",
+                    "city": city,
+                    "city_key": normalize_city(city),
+                    "images": [],
+                    "amenities": [],
+                    "available": random.random() < 0.8,
+                    "created_at": now,
+                    "updated_at": now
+                })
+            self.db.properties.insert_many(batch, ordered=False)
+        self.db.properties.create_indexes(INDEXES["properties"])
+
+    def measure(self, query: dict) -> tuple:
+        timings = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            list(self.db.properties.find(query).limit(PAGE_SIZE))
+            timings.append((time.perf_counter() - start) * 1000)
+        stats = self.db.command({
+            "explain": {"find": "properties", "filter": query, "limit": PAGE_SIZE},
+            "verbosity": "executionStats"
+        })["executionStats"]
+        return statistics.median(timings), stats["totalDocsExamined"], stats["nReturned"]
+
+    def run_benchmark(self) -> bool:
+        print("🚀 Starting City Filter Benchmark")
+        print(f"📍 Scratch database: {BENCH_DB} on {MONGO_URL}")
+        print("=" * 70)
+        self.db.client.drop_database(BENCH_DB)
+        passed = True
+        try:
+            self.seed()
+            print(f"\n{'scenario':<16}{'before p50':>12}{'examined':>10}{'after p50':>12}{'examined':>10}{'speedup':>9}")
+            for label, city, city_match in SCENARIOS:
+                before_ms, before_examined, _ = self.measure(regex_query(city))
+                after_ms, after_examined, returned = self.measure(properties_query(city, city_match))
+                speedup = before_ms / after_ms if after_ms > 0 else float("inf")
+                print(f"{label:<16}{before_ms:>10.2f}ms{before_examined:>10}{after_ms:>10.2f}ms{after_examined:>10}{speedup:>8.1f}x")
+                # The indexed query must touch only what it returns
+                passed = passed and after_examined <= returned
+        finally:
+            self.db.client.drop_database(BENCH_DB)
+
+        print("\n" + "=" * 70)
+        if passed:
+            print("✅ PASS: city_key queries examine only the listings they return")
+        else:
+            print("❌ FAIL: a city_key query examined listings it did not return")
+        return passed
+
+if __name__ == "__main__":
+    benchmark = CityFilterBenchmark()
+    benchmark.run_benchmark()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /api/chat/conversations
+Grows a tenant's inbox from 1 to 500 conversations and checks that latency stays flat
+"""
+
+import requests
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+HEADERS = {"Content-Type": "application/json"}
+
+CHECKPOINTS = [1, 10, 50, 100, 250, 500]
+SAMPLES_PER_CHECKPOINT = 20
+# p50 at the largest inbox may be at most this many times the p50 at the smallest one
+MAX_GROWTH_RATIO = 3.0
+
+class ConversationsBenchmark:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.headers = HEADERS.copy()
+        self.landlord_token = None
+        self.tenant_token = None
+        self.property_ids: List[str] = []
+        self.timings: Dict[int, List[float]] = {}
+
+    def make_request(self, method: str, endpoint: str, data: Dict = None, auth_token: str = None) -> Optional[requests.Response]:
+        """Make HTTP request, returning None on connection errors"""
+        url = f"{self.base_url}{endpoint}"
+        headers = self.headers.copy()
+        if auth_token:
+            headers["Authorization"] = f"Bearer {auth_token}"
+        try:
+            if method.upper() == "GET":
+                return requests.get(url, headers=headers, params=data)
+            elif method.upper() == "POST":
+                return requests.post(url, headers=headers, json=data)
+            elif method.upper() == "DELETE":
+                return requests.delete(url, headers=headers)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Request failed: {str(e)}")
+        return None
+
+    def register(self, label: str) -> str:
+        timestamp = str(int(time.time() * 1000))
+        user_data = {
+            "email": f"bench.{label}.{timestamp}@example.com",
+            "name": f"Bench {label.title()}",
+            "phone": f"9{timestamp[-9:]}",
+            "password": "benchpass123"
+        }
+        response = self.make_request("POST", "/auth/register", user_data)
+        if response is None or response.status_code != 200:
+            raise RuntimeError(f"Could not register {label}: {response.text if response is not None else 'no response'}")
+        return response.json()["access_token"]
+
+    def setup_users(self):
+        print("\n=== Registering benchmark users ===")
+        self.landlord_token = self.register("landlord")
+        # Keep phone numbers distinct between the two registrations
+        time.sleep(0.01)
+        self.tenant_token = self.register("tenant")
+
+    def grow_inbox_to(self, target: int):
+        """Create properties and send one tenant message per property until the inbox has `target` conversations"""
+        landlord = self.make_request("GET", "/auth/me", auth_token=self.landlord_token).json()
+        while len(self.property_ids) < target:
+            index = len(self.property_ids) + 1
+            property_data = {
+                "title": f"Benchmark Room {index}",
+                "description": "Room created by the conversations benchmark",
+                "property_type": "room",
+                "rent": 5000 + index,
+                "deposit": 10000,
+                "location": "Benchmark Street",
+                "city": "Benchmark City",
+                "images": [],
+                "amenities": []
+            }
+            response = self.make_request("POST", "/properties", property_data, self.landlord_token)
+            property_id = response.json()["id"]
+            self.property_ids.append(property_id)
+            self.make_request("POST", "/chat", {
+                "property_id": property_id,
+                "receiver_id": landlord["id"],
+                "message": f"Is room {index} still available?"
+            }, self.tenant_token)
+
+    def measure(self, conversation_count: int):
+        samples = []
+        for _ in range(SAMPLES_PER_CHECKPOINT):
+            start = time.perf_counter()
+            response = self.make_request("GET", "/chat/conversations", auth_token=self.tenant_token)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response is None or response.status_code != 200:
+                raise RuntimeError("Conversations request failed during benchmark")
+        self.timings[conversation_count] = samples
+        p50 = statistics.median(samples)
+        p95 = sorted(samples)[int(len(samples) * 0.95) - 1]
+        print(f"   {conversation_count:>4} conversations: p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+    def cleanup(self):
+        print("\n=== Cleaning up benchmark properties ===")
+        for property_id in self.property_ids:
+            self.make_request("DELETE", f"/properties/{property_id}", auth_token=self.landlord_token)
+
+    def run_benchmark(self) -> bool:
+        print("🚀 Starting Conversations Inbox Benchmark")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+
+        self.setup_users()
+        try:
+            print("\n=== Measuring GET /chat/conversations ===")
+            for checkpoint in CHECKPOINTS:
+                self.grow_inbox_to(checkpoint)
+                self.measure(checkpoint)
+        finally:
+            self.cleanup()
+
+        smallest = statistics.median(self.timings[CHECKPOINTS[0]])
+        largest = statistics.median(self.timings[CHECKPOINTS[-1]])
+        ratio = largest / smallest if smallest > 0 else float("inf")
+        flat = ratio <= MAX_GROWTH_RATIO
+
+        print("\n" + "=" * 70)
+        print("🏁 BENCHMARK SUMMARY")
+        print("=" * 70)
+        print(f"📊 p50 growth from {CHECKPOINTS[0]} to {CHECKPOINTS[-1]} conversations: {ratio:.2f}x")
+        if flat:
+            print(f"✅ PASS: latency stays flat (<= {MAX_GROWTH_RATIO}x)")
+        else:
+            print(f"❌ FAIL: latency grows with conversation count (> {MAX_GROWTH_RATIO}x)")
+        return flat
+
+if __name__ == "__main__":
+    benchmark = ConversationsBenchmark()
+    sys.exit(0 if benchmark.run_benchmark() else 1)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Regression test for the conversations aggregation pipeline
+Seeds a single conversation with 50k messages and checks the pipeline's memory use and latency
+"""
+
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+load_dotenv(BACKEND_DIR / ".env")
+
+from indexes import INDEXES  # noqa: E402
+from server import conversation_state_pipeline  # noqa: E402
+
+MESSAGE_COUNT = 50_000
+BATCH_SIZE = 5_000
+RUNS = 5
+MAX_MEDIAN_LATENCY_MS = 500
+# Memory held by $group accumulators, as reported by explain("executionStats")
+MAX_GROUP_MEMORY_BYTES = 1024 * 1024
+
+class ConversationsPipelineTest:
+    def __init__(self):
+        self.client = MongoClient(os.environ["MONGO_URL"])
+        self.db_name = f"{os.environ['DB_NAME']}_pipeline_test"
+        self.db = self.client[self.db_name]
+        self.landlord_id = str(uuid.uuid4())
+        self.tenant_id = str(uuid.uuid4())
+        self.property_id = str(uuid.uuid4())
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def seed(self):
+        print(f"\n=== Seeding {MESSAGE_COUNT} messages into {self.db_name} ===")
+        self.client.drop_database(self.db_name)
+        # The indexes the server declares, so the plans below are the ones production gets
+        for collection, indexes in INDEXES.items():
+            self.db[collection].create_indexes(indexes)
+
+        started = datetime.utcnow() - timedelta(seconds=MESSAGE_COUNT)
+        for offset in range(0, MESSAGE_COUNT, BATCH_SIZE):
+            batch = []
+            for i in range(offset, min(offset + BATCH_SIZE, MESSAGE_COUNT)):
+                from_tenant = i % 2 == 0
+                batch.append({
+                    "id": str(uuid.uuid4()),
+                    "property_id": self.property_id,
+                    "sender_id": self.tenant_id if from_tenant else self.landlord_id,
+                    "receiver_id": self.landlord_id if from_tenant else self.tenant_id,
+                    "message": f"Message number {i} " + "x" * 200,
+                    "is_read": not from_tenant,
+                    "read_at": None,
+                    "created_at": started + timedelta(seconds=i)
+                })
+            self.db.chats.insert_many(batch)
+
+    def pipeline(self):
+        return conversation_state_pipeline({"property_id": self.property_id})
+
+    def collect(self, node, key, found):
+        """Recursively collect every value stored under `key` in an explain document"""
+        if isinstance(node, dict):
+            for k, v in node.items():
+                if k == key:
+                    found.append(v)
+                self.collect(v, key, found)
+        elif isinstance(node, list):
+            for item in node:
+                self.collect(item, key, found)
+        return found
+
+    def test_result_is_correct(self):
+        print("\n=== Testing pipeline result ===")
+        conversations = list(self.db.chats.aggregate(self.pipeline()))
+        if len(conversations) != 1:
+            self.log_result("Single Conversation", False, f"Expected 1 conversation, got {len(conversations)}")
+            return
+        conv = conversations[0]
+        expected_unread = MESSAGE_COUNT // 2
+        self.log_result("Single Conversation", True)
+        self.log_result("Last Message", conv["last_message"].startswith(f"Message number {MESSAGE_COUNT - 1} "),
+                        conv["last_message"][:40])
+        unread = conv["unread"]
+        self.log_result("Unread Count", unread == {self.landlord_id: expected_unread, self.tenant_id: 0},
+                        f"Expected {expected_unread} unread for the landlord, got {unread}")
+        self.log_result("No Message History Carried", "messages" not in conv, f"Keys: {sorted(conv.keys())}")
+
+    def scan_stages(self, pipeline):
+        """Plan stages of the leading $match + $sort, which touch every message they select"""
+        explain = self.db.command(
+            "explain",
+            {"aggregate": "chats", "pipeline": pipeline[:2], "cursor": {}},
+            verbosity="queryPlanner"
+        )
+        return self.collect(explain, "stage", [])
+
+    def test_memory(self):
+        print("\n=== Testing pipeline memory ===")
+        pipeline = self.pipeline()
+        # Neither the per-property check nor the unfiltered rebuild in manage.py may sort in memory
+        stages = self.scan_stages(pipeline)
+        self.log_result("Sort Served By Index", "SORT" not in stages and "IXSCAN" in stages,
+                        f"Plan stages: {sorted(set(stages))}")
+        stages = self.scan_stages(conversation_state_pipeline())
+        self.log_result("Full Rebuild Sort Served By Index", "SORT" not in stages and "IXSCAN" in stages,
+                        f"Plan stages: {sorted(set(stages))}")
+
+        explain = self.db.command(
+            "explain",
+            {"aggregate": "chats", "pipeline": pipeline, "cursor": {}},
+            verbosity="executionStats"
+        )
+
+        spilled = [v for v in self.collect(explain, "usedDisk", []) if v]
+        self.log_result("No Disk Spill", not spilled)
+
+        accumulator_memory = self.collect(explain, "maxAccumulatorMemoryUsageBytes", [])
+        if not accumulator_memory:
+            self.log_result("Group Memory", True, "Server does not report accumulator memory; skipped")
+            return
+        peak = max(sum(v.values()) if isinstance(v, dict) else v for v in accumulator_memory)
+        self.log_result("Group Memory", peak <= MAX_GROUP_MEMORY_BYTES,
+                        f"Peak accumulator memory {peak} bytes (limit {MAX_GROUP_MEMORY_BYTES})")
+
+    def test_latency(self):
+        print("\n=== Testing pipeline latency ===")
+        samples = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            list(self.db.chats.aggregate(self.pipeline(), allowDiskUse=False))
+            samples.append((time.perf_counter() - start) * 1000)
+        median = statistics.median(samples)
+        self.log_result("Pipeline Latency", median <= MAX_MEDIAN_LATENCY_MS,
+                        f"Median {median:.1f} ms over {RUNS} runs (limit {MAX_MEDIAN_LATENCY_MS} ms)")
+
+    def run_all_tests(self):
+        print("🚀 Starting Conversations Pipeline Regression Test")
+        print("=" * 70)
+        try:
+            self.seed()
+            self.test_result_is_correct()
+            self.test_memory()
+            self.test_latency()
+        finally:
+            self.client.drop_database(self.db_name)
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = ConversationsPipelineTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
@@ -6,6 +6,16 @@ const RAW_BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const BACKEND_URL = RAW_BACKEND_URL.replace(/\/+$/, '');
 const API = `${BACKEND_URL}/api`;
 
+// Listing images are `/api/images/<hash>` references; older ones may still be inline base64.
+// References are requested at a resized variant (thumb, card or full) unless the URL already names one.
+const imageSrc = (image, size) => {
+  if (image.startsWith('data:')) return image;
+  if (image.startsWith('/api/images/')) {
+    return `${BACKEND_URL}${image}${size && !image.includes('?') ? `?size=${size}` : ''}`;
+  }
+  return `data:image/jpeg;base64,${image}`;
+};
+
 // Major Indian Cities List
 const MAJOR_INDIAN_CITIES = [
   'Agartala, Tripura',
@@ -292,9 +302,85 @@ const useCity = () => {
   return context;
 };
 
+// Access tokens are short-lived; keep the rotating refresh token next to them
+const storeTokens = ({ access_token, refresh_token }) => {
+  localStorage.setItem('token', access_token);
+  if (refresh_token) localStorage.setItem('refreshToken', refresh_token);
+  axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
+};
+
+const clearTokens = () => {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refreshToken');
+  delete axios.defaults.headers.common['Authorization'];
+};
+
+// One refresh at a time: requests that fail together wait for the same new token.
+// `staleToken` is the access token that was rejected; if the stored one has changed since,
+// another tab already refreshed and its token is used instead of rotating again.
+let pendingRefresh = null;
+const refreshAccessToken = (staleToken = localStorage.getItem('token')) => {
+  if (!pendingRefresh) {
+    const refresh = async () => {
+      const stored = localStorage.getItem('token');
+      if (stored && stored !== staleToken) {
+        axios.defaults.headers.common['Authorization'] = `Bearer ${stored}`;
+        return stored;
+      }
+      const refreshToken = localStorage.getItem('refreshToken');
+      if (!refreshToken) throw new Error('No refresh token');
+      const response = await axios.post(`${API}/auth/refresh`, { refresh_token: refreshToken });
+      storeTokens(response.data);
+      return response.data.access_token;
+    };
+    // Tabs share the tokens in localStorage, so they also take turns refreshing them
+    pendingRefresh = (navigator.locks ? navigator.locks.request('findmeroom-token-refresh', refresh) : refresh())
+      .finally(() => { pendingRefresh = null; });
+  }
+  return pendingRefresh;
+};
+
+// Follow token changes made by other tabs
+window.addEventListener('storage', (event) => {
+  if (event.key !== 'token') return;
+  if (event.newValue) {
+    axios.defaults.headers.common['Authorization'] = `Bearer ${event.newValue}`;
+  } else {
+    delete axios.defaults.headers.common['Authorization'];
+  }
+});
+
+// fetch() counterpart of the interceptor below: sends the access token and retries once after a refresh
+const authFetch = async (url, options = {}) => {
+  const send = (token) => fetch(url, { ...options, headers: { ...options.headers, Authorization: `Bearer ${token}` } });
+  const sent = localStorage.getItem('token');
+  const response = await send(sent);
+  if (response.status !== 401) return response;
+  const token = await refreshAccessToken(sent).catch(() => null);
+  return token ? send(token) : response;
+};
+
+// Endpoints whose 401 means bad credentials or a dead session, not an expired access token
+const NO_REFRESH_URL = /\/auth\/(login|register|refresh|logout)$/;
+
+// Retry a request once with a fresh access token when the old one has expired
+axios.interceptors.response.use(undefined, async (error) => {
+  const request = error.config;
+  if (error.response?.status !== 401 || !request || request._retried || NO_REFRESH_URL.test(request.url)) {
+    throw error;
+  }
+  request._retried = true;
+  const sent = (request.headers?.Authorization || '').replace('Bearer ', '');
+  const token = await refreshAccessToken(sent).catch(() => { throw error; });
+  request.headers.Authorization = `Bearer ${token}`;
+  return axios(request);
+});
+
 const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [realtimeConnected, setRealtimeConnected] = useState(false);
+  const chatListenersRef = useRef(new Set());
 
   useEffect(() => {
     const token = localStorage.getItem('token');
@@ -312,8 +398,9 @@ const AuthProvider = ({ children }) => {
       setUser(response.data);
     } catch (error) {
       console.error('Error fetching user info:', error);
-      localStorage.removeItem('token');
-      delete axios.defaults.headers.common['Authorization'];
+      // The interceptor has already tried a refresh; only a rejection ends the session,
+      // a network error keeps the tokens for the next load
+      if (error.response?.status === 401) clearTokens();
     } finally {
       setLoading(false);
     }
@@ -322,10 +409,8 @@ const AuthProvider = ({ children }) => {
   const login = async (email, password) => {
     try {
       const response = await axios.post(`${API}/auth/login`, { email, password });
-      const { access_token, user } = response.data;
-      localStorage.setItem('token', access_token);
-      axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
-      setUser(user);
+      storeTokens(response.data);
+      setUser(response.data.user);
       return { success: true };
     } catch (error) {
       return { success: false, error: error.response?.data?.detail || 'Login failed' };
@@ -335,10 +420,8 @@ const AuthProvider = ({ children }) => {
   const register = async (userData) => {
     try {
       const response = await axios.post(`${API}/auth/register`, userData);
-      const { access_token, user } = response.data;
-      localStorage.setItem('token', access_token);
-      axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
-      setUser(user);
+      storeTokens(response.data);
+      setUser(response.data.user);
       return { success: true };
     } catch (error) {
       return { success: false, error: error.response?.data?.detail || 'Registration failed' };
@@ -346,13 +429,132 @@ const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
-    localStorage.removeItem('token');
-    delete axios.defaults.headers.common['Authorization'];
+    // End the session on the server too, so its tokens stop working everywhere
+    const token = localStorage.getItem('token');
+    if (token) {
+      axios.post(`${API}/auth/logout`, null, { headers: { Authorization: `Bearer ${token}` } }).catch(() => {});
+    }
+    clearTokens();
     setUser(null);
   };
 
+  // Keep one real-time connection per logged-in user and fan its events out to subscribers
+  useEffect(() => {
+    if (!user) return;
+    let socket = null;
+    let source = null;
+    let retryTimer = null;
+    let retryDelay = 1000;
+    let failedHandshakes = 0;
+    let closed = false;
+    // The access token the current connection was opened with
+    let streamToken = null;
+
+    const dispatch = (event) => {
+      chatListenersRef.current.forEach(listener => listener(event));
+    };
+
+    // Streams close when their token expires or the session is revoked: refresh, then reconnect.
+    // A rejected refresh means the session is over, so log out locally too.
+    const reauthenticate = (reconnect) => {
+      // Every tab's streams close at the same expiry; only refresh if no other tab has already
+      refreshAccessToken(streamToken)
+        .then(() => {
+          if (closed) return;
+          reconnect();
+          // Events published while disconnected are not replayed to a new connection
+          dispatch({ type: 'resync' });
+        })
+        .catch((error) => {
+          if (closed) return;
+          if (error.response?.status === 401 || !localStorage.getItem('refreshToken')) {
+            clearTokens();
+            setUser(null);
+          } else {
+            retryTimer = setTimeout(() => reauthenticate(reconnect), retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+          }
+        });
+    };
+
+    // Proxies that break WebSockets usually pass Server-Sent Events;
+    // EventSource reconnects by itself and resumes with Last-Event-ID
+    const connectEventStream = () => {
+      streamToken = localStorage.getItem('token');
+      source = new EventSource(`${BACKEND_URL}/api/chat/events?token=${encodeURIComponent(streamToken)}`);
+      source.onopen = () => setRealtimeConnected(true);
+      source.onerror = () => {
+        setRealtimeConnected(false);
+        // A rejected token closes the stream for good; reconnect with a refreshed one
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          retryTimer = setTimeout(() => reauthenticate(connectEventStream), retryDelay);
+          retryDelay = Math.min(retryDelay * 2, 30000);
+        }
+      };
+      source.addEventListener('reauthenticate', () => {
+        source.close();
+        setRealtimeConnected(false);
+        reauthenticate(connectEventStream);
+      });
+      ['unread_count', 'conversation_updated', 'resync'].forEach(type => {
+        source.addEventListener(type, (message) => {
+          dispatch({ type, ...JSON.parse(message.data) });
+        });
+      });
+    };
+
+    const connect = () => {
+      const base = (BACKEND_URL || window.location.origin).replace(/^http/, 'ws');
+      let opened = false;
+      streamToken = localStorage.getItem('token');
+      socket = new WebSocket(`${base}/api/ws?token=${encodeURIComponent(streamToken)}`);
+      socket.onopen = () => {
+        opened = true;
+        failedHandshakes = 0;
+        retryDelay = 1000;
+        setRealtimeConnected(true);
+      };
+      socket.onmessage = (message) => {
+        dispatch(JSON.parse(message.data));
+      };
+      socket.onclose = (event) => {
+        setRealtimeConnected(false);
+        if (closed) return;
+        if (opened && event.code === 4401) {
+          // The server closed an open socket because its token expired or the session was revoked
+          reauthenticate(connect);
+          return;
+        }
+        failedHandshakes = opened ? 0 : failedHandshakes + 1;
+        if (failedHandshakes >= 2) {
+          socket = null;
+          connectEventStream();
+        } else {
+          // Reconnect with exponential backoff, with a fresh token in case the old one had expired;
+          // components poll in the meantime
+          retryTimer = setTimeout(() => (opened ? connect() : reauthenticate(connect)), retryDelay);
+          retryDelay = Math.min(retryDelay * 2, 30000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (socket) socket.close();
+      if (source) source.close();
+      setRealtimeConnected(false);
+    };
+  }, [user]);
+
+  const subscribeChatEvents = (listener) => {
+    chatListenersRef.current.add(listener);
+    return () => chatListenersRef.current.delete(listener);
+  };
+
   return (
-    <AuthContext.Provider value={{ user, login, register, logout, loading }}>
+    <AuthContext.Provider value={{ user, login, register, logout, loading, realtimeConnected, subscribeChatEvents }}>
       {children}
     </AuthContext.Provider>
   );
@@ -432,7 +634,7 @@ const CitySelectionPopup = ({ onCitySelect }) => {
 // Components
 // Mobile Bottom Navigation Component
 const MobileBottomNavigation = ({ currentView, setCurrentView }) => {
-  const { user } = useAuth();
+  const { user, realtimeConnected, subscribeChatEvents } = useAuth();
   const [unreadCount, setUnreadCount] = useState(0);
   
   // Load unread count when user is logged in
@@ -440,6 +642,17 @@ const MobileBottomNavigation = ({ currentView, setCurrentView }) => {
     if (user) {
       loadUnreadCount();
       
+      // Pushed unread counts replace polling while the real-time connection is up
+      if (realtimeConnected) {
+        return subscribeChatEvents((event) => {
+          if (event.type === 'unread_count') {
+            setUnreadCount(event.unread_count);
+          } else if (event.type === 'resync') {
+            loadUnreadCount();
+          }
+        });
+      }
+      
       // Set up polling for unread count
       const interval = setInterval(() => {
         loadUnreadCount();
@@ -447,7 +660,7 @@ const MobileBottomNavigation = ({ currentView, setCurrentView }) => {
       
       return () => clearInterval(interval);
     }
-  }, [user]);
+  }, [user, realtimeConnected]);
 
   const loadUnreadCount = async () => {
     if (!user) return;
@@ -455,11 +668,7 @@ const MobileBottomNavigation = ({ currentView, setCurrentView }) => {
     try {
       const url = `${BACKEND_URL}/api/chat/unread-count`;
       console.log('Fetching unread count from URL:', url);
-      const response = await fetch(url, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        }
-      });
+      const response = await authFetch(url);
       
       if (response.ok) {
         const data = await response.json();
@@ -659,7 +868,7 @@ const ProfilePage = ({ setCurrentView }) => {
 };
 
 const Header = ({ currentView, setCurrentView }) => {
-  const { user, logout } = useAuth();
+  const { user, logout, realtimeConnected, subscribeChatEvents } = useAuth();
   const { selectedCity, setSelectedCity } = useCity();
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
   const [unreadCount, setUnreadCount] = useState(0);
@@ -669,6 +878,17 @@ const Header = ({ currentView, setCurrentView }) => {
     if (user) {
       loadUnreadCount();
       
+      // Pushed unread counts replace polling while the real-time connection is up
+      if (realtimeConnected) {
+        return subscribeChatEvents((event) => {
+          if (event.type === 'unread_count') {
+            setUnreadCount(event.unread_count);
+          } else if (event.type === 'resync') {
+            loadUnreadCount();
+          }
+        });
+      }
+      
       // Set up polling for unread count
       const interval = setInterval(() => {
         loadUnreadCount();
@@ -676,17 +896,13 @@ const Header = ({ currentView, setCurrentView }) => {
       
       return () => clearInterval(interval);
     }
-  }, [user]);
+  }, [user, realtimeConnected]);
 
   const loadUnreadCount = async () => {
     if (!user) return;
     
     try {
-      const response = await fetch(`${BACKEND_URL}/api/chat/unread-count`, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        }
-      });
+      const response = await authFetch(`${BACKEND_URL}/api/chat/unread-count`);
       
       if (response.ok) {
         const data = await response.json();
@@ -939,7 +1155,7 @@ const HeroSection = () => {
 
 // Enhanced Chat Interface Component
 const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefilledMessage = "" }) => {
-  const { user } = useAuth();
+  const { user, realtimeConnected, subscribeChatEvents } = useAuth();
   const [conversations, setConversations] = useState([]);
   const [selectedConversation, setSelectedConversation] = useState(null);
   const [messages, setMessages] = useState([]);
@@ -958,6 +1174,38 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
       loadConversations();
       loadUnreadCount();
       
+      // Pushed events replace polling while the real-time connection is up
+      if (realtimeConnected) {
+        return subscribeChatEvents((event) => {
+          if (event.type === 'unread_count') {
+            setUnreadCount(event.unread_count);
+          } else if (event.type === 'message' || event.type === 'conversation_updated') {
+            // WebSocket sends the message itself; the event stream only names the conversation
+            const propertyId = event.type === 'message' ? event.message.property_id : event.property_id;
+            const otherUserId = event.type === 'message'
+              ? (event.message.sender_id === user.id ? event.message.receiver_id : event.message.sender_id)
+              : event.other_user_id;
+            if (selectedConversation && selectedConversation.property_id === propertyId && selectedConversation.other_user_id === otherUserId) {
+              loadChatMessages(propertyId, otherUserId, true);
+            }
+            checkAndUpdateConversations();
+          } else if (event.type === 'read') {
+            // Receipts name either explicit message ids or a read-up-to position in the conversation
+            const isCovered = (msg) => event.message_ids
+              ? event.message_ids.includes(msg.id)
+              : msg.property_id === event.property_id && msg.receiver_id === event.reader_id &&
+                (event.up_to_seq != null ? msg.seq != null && msg.seq <= event.up_to_seq
+                  : event.up_to == null || msg.created_at <= event.up_to);
+            setMessages(prev => prev.map(msg =>
+              isCovered(msg) ? { ...msg, is_read: true, read_at: event.read_at } : msg
+            ));
+          } else if (event.type === 'resync') {
+            loadUnreadCount();
+            checkAndUpdateConversations();
+          }
+        });
+      }
+      
       // Set up optimized polling for real-time updates
       const unreadInterval = setInterval(() => {
         loadUnreadCount(); // Poll unread count more frequently
@@ -983,7 +1231,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
         clearInterval(messageInterval);
       };
     }
-  }, [user, selectedConversation?.property_id, selectedConversation?.other_user_id]);
+  }, [user, realtimeConnected, selectedConversation?.property_id, selectedConversation?.other_user_id]);
 
   // Load messages when conversation selection changes
   useEffect(() => {
@@ -1004,7 +1252,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
         const newConv = {
           property_id: selectedProperty.id,
           property_title: selectedProperty.title,
-          property_image: selectedProperty.images?.[0] || null,
+          property_image: selectedProperty.thumbnail || selectedProperty.images?.[0] || null,
           other_user_id: selectedProperty.user_id,
           other_user_name: "Property Owner",
           last_message: "",
@@ -1037,11 +1285,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
   const checkAndUpdateConversations = async () => {
     try {
       const url = `${BACKEND_URL}/api/chat/conversations`;
-      const response = await fetch(url, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        }
-      });
+      const response = await authFetch(url);
       
       if (response.ok) {
         const data = await response.json();
@@ -1092,11 +1336,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
     try {
       const url = `${BACKEND_URL}/api/chat/conversations`;
       console.log('Fetching conversations from URL:', url);
-      const response = await fetch(url, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        }
-      });
+      const response = await authFetch(url);
       
       if (response.ok) {
         const data = await response.json();
@@ -1120,11 +1360,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
 
   const loadUnreadCount = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/chat/unread-count`, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        }
-      });
+      const response = await authFetch(`${BACKEND_URL}/api/chat/unread-count`);
       
       if (response.ok) {
         const data = await response.json();
@@ -1144,11 +1380,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
     }
     
     try {
-      const response = await fetch(`${BACKEND_URL}/api/chat/${propertyId}?other_user_id=${otherUserId}`, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        }
-      });
+      const response = await authFetch(`${BACKEND_URL}/api/chat/${propertyId}?other_user_id=${otherUserId}`);
       
       if (response.ok) {
         const data = await response.json();
@@ -1166,7 +1398,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
           msg.receiver_id === user.id && !msg.is_read
         );
         if (unreadMessages.length > 0) {
-          markMessagesRead(unreadMessages.map(msg => msg.id));
+          markConversationRead(propertyId, otherUserId, unreadMessages[unreadMessages.length - 1]);
         }
       }
     } catch (error) {
@@ -1180,23 +1412,29 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
     }
   };
 
-  const markMessagesRead = async (messageIds) => {
+  const markConversationRead = async (propertyId, otherUserId, newestUnread) => {
     try {
-      const url = `${BACKEND_URL}/api/chat/mark-read`;
-      console.log('Marking messages as read with URL:', url);
-      await fetch(url, {
+      const url = `${BACKEND_URL}/api/chat/conversations/mark-read`;
+      console.log('Marking conversation as read with URL:', url);
+      // Messages that predate sequence numbers are marked up to their timestamp instead
+      const position = newestUnread.seq != null ? { up_to_seq: newestUnread.seq } : { up_to: newestUnread.created_at };
+      const response = await authFetch(url, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
+          'Content-Type': 'application/json'
         },
         body: JSON.stringify({
-          message_ids: messageIds
+          property_id: propertyId,
+          other_user_id: otherUserId,
+          ...position
         })
       });
       
-      // Refresh unread count
-      loadUnreadCount();
+      // The response carries the new unread total, so no follow-up unread-count request
+      if (response.ok) {
+        const data = await response.json();
+        setUnreadCount(data.unread_count);
+      }
     } catch (error) {
       console.error('Failed to mark messages as read:', error);
     }
@@ -1210,11 +1448,10 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
     try {
       const url = `${BACKEND_URL}/api/chat`;
       console.log('Sending message with URL:', url);
-      const response = await fetch(url, {
+      const response = await authFetch(url, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
+          'Content-Type': 'application/json'
         },
         body: JSON.stringify({
           property_id: selectedConversation.property_id,
@@ -1347,7 +1584,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
                   <div className="w-12 h-12 bg-gray-200 rounded-lg flex-shrink-0">
                     {conversation.property_image ? (
                       <img 
-                        src={conversation.property_image.startsWith('data:') ? conversation.property_image : `data:image/jpeg;base64,${conversation.property_image}`}
+                        src={imageSrc(conversation.property_image, 'thumb')}
                         alt={conversation.property_title}
                         className="w-full h-full object-cover rounded-lg"
                       />
@@ -1411,7 +1648,7 @@ const EnhancedChatInterface = ({ setCurrentView, selectedProperty = null, prefil
                 <div className="w-10 h-10 bg-gray-200 rounded-lg flex-shrink-0">
                   {selectedConversation.property_image ? (
                     <img 
-                      src={selectedConversation.property_image.startsWith('data:') ? selectedConversation.property_image : `data:image/jpeg;base64,${selectedConversation.property_image}`}
+                      src={imageSrc(selectedConversation.property_image, 'thumb')}
                       alt={selectedConversation.property_title}
                       className="w-full h-full object-cover rounded-lg"
                     />
@@ -1555,9 +1792,9 @@ const PropertyCard = ({ property, onViewDetails, setCurrentView, setChatProperty
   return (
     <div className="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-lg transition-shadow">
       <div className="h-48 bg-gray-200 relative">
-        {property.images && property.images.length > 0 ? (
+        {property.thumbnail ? (
           <img 
-            src={property.images[0].startsWith('data:') ? property.images[0] : `data:image/jpeg;base64,${property.images[0]}`}
+            src={imageSrc(property.thumbnail, 'card')}
             alt={property.title}
             className="w-full h-full object-cover"
           />
@@ -1716,6 +1953,14 @@ const SearchFilters = ({ onSearch }) => {
 
 const PropertyDetails = ({ property, onClose, setCurrentView, setChatProperty }) => {
   const { user } = useAuth();
+  // List pages only carry a thumbnail; the full image set comes from the property itself
+  const [images, setImages] = useState(property.thumbnail ? [property.thumbnail] : []);
+
+  useEffect(() => {
+    axios.get(`${API}/properties/${property.id}`)
+      .then(response => setImages(response.data.images || []))
+      .catch(error => console.error('Error fetching property images:', error));
+  }, [property.id]);
 
   const handleContactOwner = () => {
     if (!user) {
@@ -1782,13 +2027,13 @@ const PropertyDetails = ({ property, onClose, setCurrentView, setChatProperty })
             </button>
           </div>
           
-          {property.images && property.images.length > 0 && (
+          {images.length > 0 && (
             <div className="mb-6">
               <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
-                {property.images.map((image, index) => (
+                {images.map((image, index) => (
                   <img 
                     key={index}
-                    src={image.startsWith('data:') ? image : `data:image/jpeg;base64,${image}`}
+                    src={imageSrc(image, 'full')}
                     alt={`Property ${index + 1}`}
                     className="w-full h-64 object-cover rounded-lg"
                   />
@@ -2079,18 +2324,11 @@ const PostPropertyForm = ({ setCurrentView }) => {
 const [loading, setLoading] = useState(false);
 const [success, setSuccess] = useState(false);
 const [imageError, setImageError] = useState(false);
+const [error, setError] = useState('');
+// Selected files are uploaded as multipart after the listing is created; previews are object URLs
 const handleImageUpload = (e) => {
   const files = Array.from(e.target.files);
-  const fileReaders = [];
-
-  files.forEach((file) => {
-    const reader = new FileReader();
-    reader.onload = (event) => {
-      setImages((prevImages) => [...prevImages, event.target.result]);
-    };
-    reader.readAsDataURL(file);
-    fileReaders.push(reader);
-  });
+  setImages((prevImages) => [...prevImages, ...files.map((file) => ({ file, preview: URL.createObjectURL(file) }))]);
 
   // Clear any previous error
   setImageError(false);
@@ -2100,6 +2338,7 @@ const handleImageUpload = (e) => {
 const handleSubmit = async (e) => {
   e.preventDefault();
   setLoading(true);
+  setError('');
 
   // Validate image presence
   if (images.length === 0) {
@@ -2108,16 +2347,23 @@ const handleSubmit = async (e) => {
     return;
   }
 
+  let propertyId = null;
   try {
     const propertyData = {
       ...formData,
       rent: parseInt(formData.rent),
       deposit: parseInt(formData.deposit),
       amenities: formData.amenities.split(',').map(a => a.trim()).filter(a => a),
-      images: images
+      images: []
     };
 
-    await axios.post(`${API}/properties`, propertyData);
+    const response = await axios.post(`${API}/properties`, propertyData);
+    propertyId = response.data.id;
+    const upload = new FormData();
+    images.forEach(({ file }) => upload.append('images', file));
+    await axios.post(`${API}/properties/${propertyId}/images`, upload);
+    propertyId = null;
+    images.forEach(({ preview }) => URL.revokeObjectURL(preview));
     setSuccess(true);
     setFormData({
       title: '',
@@ -2138,6 +2384,16 @@ const handleSubmit = async (e) => {
     }, 2000);
   } catch (error) {
     console.error('Error creating property:', error);
+    // A listing whose images were rejected would go live without any, so take it down again
+    if (propertyId) {
+      try {
+        await axios.delete(`${API}/properties/${propertyId}`);
+      } catch (deleteError) {
+        console.error('Error removing property after failed upload:', deleteError);
+      }
+    }
+    const detail = error.response?.data?.detail;
+    setError(typeof detail === 'string' ? detail : 'Failed to post property');
   } finally {
     setLoading(false);
   }
@@ -2154,6 +2410,12 @@ const handleSubmit = async (e) => {
         </div>
       )}
       
+      {error && (
+        <div className="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">
+          {error}
+        </div>
+      )}
+      
       <form onSubmit={handleSubmit} className="space-y-4">
         <div>
           <label className="block text-gray-700 text-sm font-bold mb-2">Title</label>
@@ -2266,7 +2528,7 @@ const handleSubmit = async (e) => {
   {images.length > 0 && (
     <div className="mt-2 grid grid-cols-3 gap-2">
       {images.map((image, index) => (
-        <img key={index} src={image} alt={`Preview ${index}`} className="w-full h-20 object-cover rounded" />
+        <img key={index} src={image.preview} alt={`Preview ${index}`} className="w-full h-20 object-cover rounded" />
       ))}
     </div>
   )}
@@ -2290,6 +2552,9 @@ const HomePage = ({ setCurrentView, setChatProperty }) => {
   const [properties, setProperties] = useState([]);
   const [loading, setLoading] = useState(false);
   const [selectedProperty, setSelectedProperty] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [currentFilters, setCurrentFilters] = useState({});
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Only fetch properties when a city is selected (performance optimization)
   useEffect(() => {
@@ -2317,6 +2582,8 @@ const HomePage = ({ setCurrentView, setChatProperty }) => {
       
       const response = await axios.get(`${API}/properties?${params}`);
       setProperties(response.data);
+      setCurrentFilters(filters);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching properties:', error);
     } finally {
@@ -2324,6 +2591,28 @@ const HomePage = ({ setCurrentView, setChatProperty }) => {
     }
   };
 
+  // Next page of the same search, continuing from the cursor the last page returned
+  const loadMoreProperties = async () => {
+    if (!nextCursor) return;
+    
+    setLoadingMore(true);
+    try {
+      const params = new URLSearchParams();
+      Object.entries(currentFilters).forEach(([key, value]) => {
+        if (value) params.append(key, value);
+      });
+      params.append('cursor', nextCursor);
+      
+      const response = await axios.get(`${API}/properties?${params}`);
+      setProperties(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error loading more properties:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <div className="min-h-screen bg-gray-50">
       <HeroSection />
@@ -2354,7 +2643,7 @@ const HomePage = ({ setCurrentView, setChatProperty }) => {
                 <h2 className="text-2xl font-bold text-gray-900 mb-2">
                   Properties in {selectedCity}
                 </h2>
-                <p className="text-gray-600">{properties.length} properties available</p>
+                <p className="text-gray-600">{properties.length}{nextCursor ? "+" : ""} properties available</p>
               </div>
             )}
             
@@ -2369,6 +2658,18 @@ const HomePage = ({ setCurrentView, setChatProperty }) => {
                 />
               ))}
             </div>
+            
+            {nextCursor && (
+              <div className="flex justify-center mt-8">
+                <button
+                  onClick={loadMoreProperties}
+                  disabled={loadingMore}
+                  className="px-6 py-2 bg-white border border-gray-300 text-gray-700 rounded-lg hover:bg-gray-50 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </>
         )}
         
@@ -2435,13 +2736,9 @@ const MyPropertiesPage = () => {
   {properties.map((property) => (
     <div key={property.id} className="bg-white rounded-lg shadow-md overflow-hidden">
       <div className="h-48 bg-gray-200 relative">
-        {property.images && property.images.length > 0 ? (
+        {property.thumbnail ? (
           <img 
-            src={
-              property.images[0].startsWith('data:')
-                ? property.images[0]
-                : `data:image/jpeg;base64,${property.images[0]}`
-            }
+            src={imageSrc(property.thumbnail, 'card')}
             alt={property.title}
             className="w-full h-full object-cover"
           />
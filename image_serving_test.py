@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Test for content-addressed listing images
+Creates listings with inline images and checks they come back as deduplicated references served with ETag, Range and caching headers,
+and that list views link resized variants rather than the original
+
+Run with BLOB_STORE=s3 (plus the server's S3_BUCKET, S3_ENDPOINT_URL and AWS credentials, e.g. for a local MinIO)
+against a server configured the same way to also check the S3 blob store directly
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import sys
+import time
+from pathlib import Path
+
+import requests
+from dotenv import load_dotenv
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+load_dotenv(BACKEND_DIR / ".env")
+
+from blob_store import create_blob_store  # noqa: E402
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+HEADERS = {"Content-Type": "application/json"}
+
+# A 1x1 JPEG
+TINY_JPEG = (
+    "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAYEBQYFBAYGBQYHBwYIChAKCgkJChQODwwQFxQYGBcUFhYaHSUfGhsjHBYWICwgIyYnKSopGR8tMC0oMCUoKSj/"
+    "2wBDAQcHBwoIChMKChMoGhYaKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCj/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/"
+    "xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwCdABmX/9k="
+)
+
+class ImageServingTest:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.headers = HEADERS.copy()
+        self.token = None
+        self.property_ids = []
+        self.image_url = None
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def auth(self) -> dict:
+        return {**self.headers, "Authorization": f"Bearer {self.token}"}
+
+    def setup(self):
+        print("\n=== Registering a landlord ===")
+        timestamp = str(int(time.time() * 1000))
+        response = requests.post(f"{self.base_url}/auth/register", headers=self.headers, json={
+            "email": f"images.{timestamp}@example.com",
+            "name": "Image Landlord",
+            "phone": f"7{timestamp[-9:]}",
+            "password": "imagetestpass123"
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not register: {response.text}")
+        self.token = response.json()["access_token"]
+
+    def create_property(self, images: list) -> requests.Response:
+        response = requests.post(f"{self.base_url}/properties", headers=self.auth(), json={
+            "title": "Image Test Room",
+            "description": "Room created by the image serving test",
+            "property_type": "room",
+            "rent": 6000,
+            "deposit": 12000,
+            "location": "Image Street",
+            "city": "Image City",
+            "images": images,
+            "amenities": []
+        })
+        if response.status_code == 200:
+            self.property_ids.append(response.json()["id"])
+        return response
+
+    def test_upload_stores_references(self):
+        print("\n=== Testing image upload ===")
+        first = self.create_property([TINY_JPEG])
+        second = self.create_property([TINY_JPEG.split(",", 1)[1]])
+        if first.status_code != 200 or second.status_code != 200:
+            self.log_result("Create Listings With Images", False, f"HTTP {first.status_code}/{second.status_code}")
+            return
+        reference = first.json()["images"][0]
+        self.image_url = self.base_url.removesuffix("/api") + reference
+        self.log_result(
+            "Images Stored As References",
+            reference.startswith("/api/images/"),
+            f"Got {reference[:40]}..."
+        )
+        self.log_result(
+            "Identical Images Share One Blob",
+            second.json()["images"] == [reference]
+        )
+        response = self.create_property(["bm90IGFuIGltYWdl"])
+        self.log_result("Non-Image Upload Rejected", response.status_code == 400, f"HTTP {response.status_code}")
+
+    def test_full_download(self):
+        print("\n=== Testing image download ===")
+        response = requests.get(self.image_url)
+        digest = self.image_url.rsplit("/", 1)[1]
+        self.log_result(
+            "Image Served By Content Hash",
+            response.status_code == 200 and hashlib.sha256(response.content).hexdigest() == digest,
+            f"HTTP {response.status_code}, {len(response.content)} bytes"
+        )
+        self.log_result(
+            "Immutable Caching Headers",
+            "immutable" in response.headers.get("Cache-Control", "") and response.headers.get("ETag") == f'"{digest}"',
+            f"Cache-Control: {response.headers.get('Cache-Control')}, ETag: {response.headers.get('ETag')}"
+        )
+        revalidated = requests.get(self.image_url, headers={"If-None-Match": response.headers.get("ETag", "")})
+        self.log_result("Matching ETag Returns 304", revalidated.status_code == 304, f"HTTP {revalidated.status_code}")
+
+    def test_ranges(self):
+        print("\n=== Testing range requests ===")
+        full = requests.get(self.image_url).content
+        size = len(full)
+        response = requests.get(self.image_url, headers={"Range": "bytes=0-9"})
+        self.log_result(
+            "Range Returns Partial Content",
+            response.status_code == 206 and response.content == full[:10]
+            and response.headers.get("Content-Range") == f"bytes 0-9/{size}",
+            f"HTTP {response.status_code}, Content-Range: {response.headers.get('Content-Range')}"
+        )
+        response = requests.get(self.image_url, headers={"Range": "bytes=-4"})
+        self.log_result("Suffix Range Returns The Tail", response.status_code == 206 and response.content == full[-4:])
+        response = requests.get(self.image_url, headers={"Range": f"bytes={size}-"})
+        self.log_result(
+            "Range Past The End Returns 416",
+            response.status_code == 416 and response.headers.get("Content-Range") == f"bytes */{size}",
+            f"HTTP {response.status_code}"
+        )
+        response = requests.get(self.base_url + "/images/" + "0" * 64)
+        self.log_result("Unknown Image Returns 404", response.status_code == 404, f"HTTP {response.status_code}")
+
+    def test_variants(self):
+        print("\n=== Testing resized variants ===")
+        original = requests.get(self.image_url)
+        webp = requests.get(self.image_url, params={"size": "thumb"}, headers={"Accept": "image/webp,*/*"})
+        self.log_result(
+            "Thumbnail Negotiated As WebP",
+            webp.status_code == 200 and webp.headers.get("Content-Type") == "image/webp"
+            and "Accept" in webp.headers.get("Vary", ""),
+            f"HTTP {webp.status_code}, Content-Type: {webp.headers.get('Content-Type')}"
+        )
+        self.log_result(
+            "Variant Is Not The Original",
+            webp.headers.get("ETag") != original.headers.get("ETag") and webp.content != original.content
+        )
+        jpeg = requests.get(self.image_url, params={"size": "card", "format": "jpeg"})
+        self.log_result(
+            "Explicit JPEG Card Variant",
+            jpeg.status_code == 200 and jpeg.headers.get("Content-Type") == "image/jpeg"
+            and "immutable" in jpeg.headers.get("Cache-Control", ""),
+            f"HTTP {jpeg.status_code}, Content-Type: {jpeg.headers.get('Content-Type')}"
+        )
+        response = requests.get(self.image_url, params={"size": "poster"})
+        self.log_result("Unknown Size Rejected", response.status_code == 400, f"HTTP {response.status_code}")
+
+        listing = requests.get(f"{self.base_url}/my-properties", headers=self.auth()).json()
+        thumbnails = [prop.get("thumbnail") for prop in listing if prop["id"] in self.property_ids]
+        self.log_result(
+            "List View Links A Variant",
+            bool(thumbnails) and all(thumbnail.endswith("?size=card") for thumbnail in thumbnails),
+            f"Thumbnails: {thumbnails}"
+        )
+
+    def test_multipart_upload(self):
+        print("\n=== Testing multipart upload ===")
+        response = self.create_property([])
+        if response.status_code != 200:
+            self.log_result("Create Listing For Upload", False, f"HTTP {response.status_code}")
+            return
+        url = f"{self.base_url}/properties/{response.json()['id']}/images"
+        auth = {"Authorization": f"Bearer {self.token}"}
+        jpeg = base64.b64decode(TINY_JPEG.split(",", 1)[1])
+        # Random bytes after a JPEG header: large, unique and cheap to make
+        large = jpeg[:20] + os.urandom(8 * 1024 * 1024)
+
+        response = requests.post(url, headers=auth, files=[("images", ("a.jpg", jpeg, "image/jpeg")), ("images", ("b.jpg", large, "image/jpeg"))])
+        uploaded = response.json() if response.status_code == 200 else []
+        self.log_result(
+            "Multipart Upload Returns References",
+            len(uploaded) == 2 and uploaded[1] == "/api/images/" + hashlib.sha256(large).hexdigest(),
+            f"HTTP {response.status_code}"
+        )
+        listing = requests.get(url.removesuffix("/images")).json()
+        self.log_result("Uploads Appended To Listing", listing.get("images") == uploaded, f"Images: {listing.get('images')}")
+
+        response = requests.post(url, headers=auth, files={"images": ("huge.jpg", jpeg[:20] + os.urandom(11 * 1024 * 1024), "image/jpeg")})
+        self.log_result("Oversized Image Rejected", response.status_code == 413, f"HTTP {response.status_code}")
+        response = requests.post(url, headers=auth, files={"images": ("notes.txt", b"not an image at all", "text/plain")})
+        self.log_result("Non-Image Part Rejected", response.status_code == 415, f"HTTP {response.status_code}")
+        response = requests.post(url, headers=auth, files=[("images", (f"{i}.jpg", jpeg, "image/jpeg")) for i in range(19)])
+        self.log_result("Image Count Limit Enforced", response.status_code == 413, f"HTTP {response.status_code}")
+
+    def test_granular_edits(self):
+        print("\n=== Testing image add, move and remove ===")
+        response = self.create_property([])
+        if response.status_code != 200:
+            self.log_result("Create Listing For Edits", False, f"HTTP {response.status_code}")
+            return
+        url = f"{self.base_url}/properties/{response.json()['id']}/images"
+        auth = {"Authorization": f"Bearer {self.token}"}
+        files = [("images", (f"{i}.jpg", b"\xff\xd8\xff" + os.urandom(256), "image/jpeg")) for i in range(3)]
+        first, second, third = requests.post(url, headers=auth, files=files).json()
+        cover = requests.post(url, headers=auth, params={"position": 0}, files=[files[0]]).json()
+        listing = requests.get(url.removesuffix("/images")).json()
+        self.log_result(
+            "Upload Inserted At Position",
+            cover == [first] and listing["images"] == [first, first, second, third],
+            f"Images: {listing['images']}"
+        )
+
+        def digest(reference: str) -> str:
+            return reference.rsplit("/", 1)[1]
+
+        response = requests.patch(f"{url}/{digest(third)}", headers=auth, json={"position": 0})
+        self.log_result(
+            "Move Image To Front",
+            response.status_code == 200 and response.json() == [third, first, first, second],
+            f"HTTP {response.status_code}"
+        )
+        response = requests.delete(f"{url}/{digest(first)}", headers=auth)
+        self.log_result(
+            "Remove Image",
+            response.status_code == 200 and response.json() == [third, second],
+            f"HTTP {response.status_code}"
+        )
+        response = requests.delete(f"{url}/{digest(first)}", headers=auth)
+        self.log_result("Removing A Missing Image Returns 404", response.status_code == 404, f"HTTP {response.status_code}")
+
+    async def check_s3_store(self):
+        store = create_blob_store(
+            "s3",
+            "",
+            bucket=os.environ.get("S3_BUCKET"),
+            prefix=os.environ.get("S3_PREFIX", "images/"),
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL")
+        )
+        created = []
+        try:
+            if self.image_url:
+                digest = self.image_url.rsplit("/", 1)[1]
+                info = await store.stat(digest)
+                self.log_result("Uploaded Image Stored In Bucket", info is not None and info["content_type"] == "image/jpeg", f"{info}")
+
+            # Larger than one chunk, written in uneven pieces, so it is spooled and uploaded rather than held whole
+            data = os.urandom(200 * 1024)
+            writer = store.writer()
+            for offset in range(0, len(data), 70 * 1024):
+                await writer.write(data[offset:offset + 70 * 1024])
+            digest = await writer.commit("application/octet-stream")
+            created.append(digest)
+            stored = await store.read(digest)
+            self.log_result("Streamed Blob Round-Trips", digest == hashlib.sha256(data).hexdigest() and stored == data,
+                            f"{len(stored or b'')} of {len(data)} bytes")
+            part = b"".join([chunk async for chunk in store.stream(digest, 1000, 1999)])
+            self.log_result("Blob Range Read", part == data[1000:2000], f"{len(part)} bytes")
+
+            writer = store.writer()
+            digest = await writer.commit("application/octet-stream")
+            created.append(digest)
+            self.log_result("Empty Blob Round-Trips", await store.read(digest) == b"" and digest == hashlib.sha256(b"").hexdigest())
+
+            writer = store.writer()
+            await writer.abort()
+            self.log_result("Aborting An Unused Writer", True)
+        finally:
+            for digest in created:
+                await asyncio.to_thread(store._client.delete_object, Bucket=store.bucket, Key=store._key(digest))
+
+    def test_s3_store(self):
+        print("\n=== Testing S3 blob store ===")
+        asyncio.run(self.check_s3_store())
+
+    def run_all_tests(self):
+        print("🚀 Starting Image Serving Test")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+        self.setup()
+        try:
+            self.test_upload_stores_references()
+            if self.image_url:
+                self.test_full_download()
+                self.test_ranges()
+                self.test_variants()
+            self.test_multipart_upload()
+            self.test_granular_edits()
+            if os.environ.get("BLOB_STORE") == "s3":
+                self.test_s3_store()
+        finally:
+            for property_id in self.property_ids:
+                requests.delete(f"{self.base_url}/properties/{property_id}", headers=self.auth())
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = ImageServingTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
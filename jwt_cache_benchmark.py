@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of get_current_user with and without the decoded-JWT cache
+Calls the dependency in-process at a steady 5k requests per second from a pool of polling clients
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+import server  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+RATE = 5_000
+SECONDS = 5
+CLIENTS = 2_000
+# Requests are issued in ticks of this many milliseconds to hold the rate
+TICK_MS = 10
+
+def percentile(timings: list, fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class JWTCacheBenchmark:
+    def __init__(self):
+        self.credentials = []
+
+    def setup(self):
+        # Principals are pre-loaded so the run measures token verification, not the database
+        for _ in range(CLIENTS):
+            user_id = str(uuid.uuid4())
+            server.principal_cache.set(user_id, {"id": user_id, "email": f"{user_id}@example.com", "name": "Bench"})
+            token = server.create_access_token(data={"sub": user_id})
+            self.credentials.append(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+    async def run_at_rate(self) -> tuple:
+        """Per-call latencies in µs and the CPU share the calls took"""
+        timings = []
+        per_tick = RATE * TICK_MS // 1000
+        started, cpu_started = time.perf_counter(), time.process_time()
+        for tick in range(SECONDS * 1000 // TICK_MS):
+            for i in range(per_tick):
+                credentials = self.credentials[(tick * per_tick + i) % CLIENTS]
+                start = time.perf_counter()
+                await server.get_current_user(credentials)
+                timings.append((time.perf_counter() - start) * 1_000_000)
+            # Sleep until the next tick so calls arrive at the target rate
+            delay = started + (tick + 1) * TICK_MS / 1000 - time.perf_counter()
+            await asyncio.sleep(max(delay, 0))
+        wall, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+        return timings, cpu / wall
+
+    async def run(self) -> dict:
+        self.setup()
+        results = {}
+        for label, size in (("without cache", 0), ("with cache", CLIENTS * 2)):
+            server.jwt_cache = TTLCache(max_size=size, ttl=server.jwt_cache.ttl)
+            timings, cpu_share = await self.run_at_rate()
+            results[label] = timings
+            print(f"{label:<15} n={len(timings):<7} p50={statistics.median(timings):7.1f}µs  "
+                  f"p99={percentile(timings, 0.99):7.1f}µs  CPU {cpu_share:6.1%}  {server.jwt_cache.stats()}")
+        return results
+
+    def run_benchmark(self) -> bool:
+        print("🚀 Starting JWT Cache Benchmark")
+        print(f"📍 {RATE} get_current_user calls per second for {SECONDS}s across {CLIENTS} tokens")
+        print("=" * 70)
+        results = asyncio.run(self.run())
+        speedup = statistics.median(results["without cache"]) / statistics.median(results["with cache"])
+        print("\n" + "=" * 70)
+        passed = speedup > 1
+        if passed:
+            print(f"✅ PASS: cached verification is {speedup:.1f}x faster at p50")
+        else:
+            print(f"❌ FAIL: the cache did not speed up verification ({speedup:.2f}x)")
+        return passed
+
+if __name__ == "__main__":
+    benchmark = JWTCacheBenchmark()
+    sys.exit(0 if benchmark.run_benchmark() else 1)
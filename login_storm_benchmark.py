@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark of unrelated endpoint latency during a login storm
+Measures p50/p99 of GET /api/ and GET /api/properties on their own, then again while many clients log in at once
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+
+PROBE_SECONDS = 10
+PROBE_INTERVAL = 0.02
+STORM_CLIENTS = 64
+# p99 under the storm may grow by this factor (plus a little slack) before the run fails
+MAX_P99_GROWTH = 2.0
+P99_SLACK_MS = 20
+PROBED_PATHS = ["/", "/properties?limit=20"]
+
+def percentile(timings: list, fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class LoginStormBenchmark:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.credentials = None
+        self.logins = 0
+
+    async def setup(self, client: httpx.AsyncClient):
+        timestamp = str(int(time.time() * 1000))
+        self.credentials = {"email": f"storm.{timestamp}@example.com", "password": "stormpass123"}
+        response = await client.post("/auth/register", json={
+            **self.credentials,
+            "name": "Storm User",
+            "phone": f"8{timestamp[-9:]}"
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not register: {response.text}")
+
+    async def probe(self, client: httpx.AsyncClient, seconds: float) -> dict:
+        """Latency in ms of each probed path, requested one after another"""
+        timings = {path: [] for path in PROBED_PATHS}
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for path in PROBED_PATHS:
+                start = time.perf_counter()
+                await client.get(path)
+                timings[path].append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(PROBE_INTERVAL)
+        return timings
+
+    async def login_loop(self, client: httpx.AsyncClient, stop: asyncio.Event):
+        while not stop.is_set():
+            response = await client.post("/auth/login", json=self.credentials)
+            if response.status_code == 200:
+                self.logins += 1
+
+    def report(self, label: str, timings: dict):
+        print(f"\n{label}")
+        for path, samples in timings.items():
+            print(f"   GET {path:<22} n={len(samples):<5} p50={statistics.median(samples):7.2f}ms  p99={percentile(samples, 0.99):7.2f}ms")
+
+    async def run(self) -> bool:
+        limits = httpx.Limits(max_connections=STORM_CLIENTS + 8)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=60, limits=limits) as client:
+            await self.setup(client)
+            baseline = await self.probe(client, PROBE_SECONDS)
+            self.report("Idle", baseline)
+
+            stop = asyncio.Event()
+            storm = [asyncio.create_task(self.login_loop(client, stop)) for _ in range(STORM_CLIENTS)]
+            await asyncio.sleep(1)
+            try:
+                loaded = await self.probe(client, PROBE_SECONDS)
+            finally:
+                stop.set()
+                await asyncio.gather(*storm)
+            self.report(f"During a storm of {STORM_CLIENTS} concurrent logins ({self.logins} logins)", loaded)
+            print(f"\n   password hashing: {(await client.get('/metrics')).json()['password_hashing']}")
+
+        passed = True
+        for path in PROBED_PATHS:
+            idle, storm_p99 = percentile(baseline[path], 0.99), percentile(loaded[path], 0.99)
+            passed = passed and storm_p99 <= idle * MAX_P99_GROWTH + P99_SLACK_MS
+        return passed
+
+    def run_benchmark(self) -> bool:
+        print("🚀 Starting Login Storm Benchmark")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+        passed = asyncio.run(self.run())
+        print("\n" + "=" * 70)
+        if passed:
+            print("✅ PASS: unrelated endpoints kept their p99 during the login storm")
+        else:
+            print(f"❌ FAIL: p99 grew by more than {MAX_P99_GROWTH}x + {P99_SLACK_MS}ms during the login storm")
+        return passed
+
+if __name__ == "__main__":
+    benchmark = LoginStormBenchmark()
+    sys.exit(0 if benchmark.run_benchmark() else 1)
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression suite for every route in api_router
+Seeds a realistic dataset in a scratch database on the local mongod, drives each route in-process,
+captures its queries with pymongo command monitoring and checks their explain plans
+"""
+
+import asyncio
+import copy
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+# Keep uploaded images out of the real blob store
+os.environ["BLOB_STORE"] = "local"
+os.environ["BLOB_STORE_PATH"] = tempfile.mkdtemp(prefix="query_plans_blobs_")
+
+import server  # noqa: E402
+
+MONGO_URL = os.environ["MONGO_URL"]
+TEST_DB = f"{os.environ['DB_NAME']}_query_plans"
+
+SEED_USERS = 500
+SEED_PROPERTIES = 5_000
+SEED_CONVERSATIONS = 150
+SEED_MESSAGES_PER_CONVERSATION = 200
+DEEP_PAGE = 15
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Pune", "Hyderabad", "Chennai", "Kolkata", "Jaipur"]
+PROPERTY_TYPES = ["room", "house", "pg"]
+
+# A query fails if it examines more than this many documents per document it returns
+MAX_EXAMINED_RATIO = 5
+# Commands whose plans are checked; inserts and index builds have nothing to explain
+EXPLAINED_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Scenario name -> reason its queries are allowed to miss the checks
+KNOWN_SLOW = {}
+# Long-lived streams only authenticate, which GET /api/auth/me already covers
+STREAM_ROUTES = {"/api/chat/events", "/api/ws"}
+# A 1x1 JPEG for the listing created by the suite
+TINY_JPEG = (
+    "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAYEBQYFBAYGBQYHBwYIChAKCgkJChQODwwQFxQYGBcUFhYaHSUfGhsjHBYWICwgIyYnKSopGR8tMC0oMCUoKSj/"
+    "2wBDAQcHBwoIChMKChMoGhYaKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCj/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/"
+    "xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwCdABmX/9k="
+)
+
+class QueryRecorder(monitoring.CommandListener):
+    """Collects the commands the app sends to the scratch database"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.database_name == TEST_DB and event.command_name in EXPLAINED_COMMANDS:
+            self.commands.append(copy.deepcopy(dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def explainable(command: dict) -> list:
+    """Strip session fields and split multi-statement writes, which explain takes one at a time"""
+    command = {k: v for k, v in command.items() if not k.startswith("$") and k not in ("lsid", "txnNumber")}
+    if "updates" in command:
+        return [{**command, "updates": [statement]} for statement in command["updates"]]
+    if "deletes" in command:
+        return [{**command, "deletes": [statement]} for statement in command["deletes"]]
+    return [command]
+
+def plan_stages(node, found=None) -> list:
+    """Every classic plan stage name in an explain document, including $lookup sub-plans"""
+    found = [] if found is None else found
+    if isinstance(node, dict):
+        if isinstance(node.get("stage"), str):
+            found.append(node["stage"])
+            # Slot-based $lookup pushed into the find layer without an index on the foreign side
+            if node["stage"] == "EQ_LOOKUP" and node.get("strategy") == "NestedLoopJoin":
+                found.append("COLLSCAN")
+        if node.get("collectionScans"):
+            found.append("COLLSCAN")
+        for key, value in node.items():
+            # The slot-based plan repeats the classic one with different stage names
+            if key not in ("slotBasedPlan", "rejectedPlans"):
+                plan_stages(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            plan_stages(item, found)
+    return found
+
+def execution_stats(explain: dict) -> dict:
+    if "executionStats" in explain:
+        return explain["executionStats"]
+    # Aggregations that are not fully pushed down report the cursor stage separately
+    for stage in explain.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"]["executionStats"]
+    return {}
+
+def examined_and_returned(stats: dict) -> tuple:
+    examined = max(stats.get("totalDocsExamined", 0), stats.get("totalKeysExamined", 0))
+    returned = stats.get("nReturned", 0)
+    stages = stats.get("executionStages", {})
+    # Write plans return nothing; count what the write would touch instead
+    returned = max(returned, stages.get("nMatched", 0), stages.get("nWouldDelete", 0))
+    return examined, returned
+
+class QueryPlanTest:
+    def __init__(self):
+        self.recorder = QueryRecorder()
+        self.sync_db = MongoClient(MONGO_URL)[TEST_DB]
+        self.http = None
+        self.tokens = {}
+        self.user_ids = {}
+        self.property_id = None
+        self.covered_routes = set()
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def auth(self, label: str) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[label]}"}
+
+    def seed(self):
+        print("\n=== Seeding the scratch database ===")
+        random.seed(13)
+        now = datetime.utcnow()
+        users = [
+            {
+                "id": str(uuid.uuid4()),
+                "email": f"seed{i}@example.com",
+                "name": f"Seed User {i}",
+                "phone": f"{9000000000 + i}",
+                "password_hash": "unused",
+                "created_at": now
+            }
+            for i in range(SEED_USERS)
+        ]
+        self.sync_db.users.insert_many(users)
+        properties = []
+        for i in range(SEED_PROPERTIES):
+            city = random.choice(CITIES)
+            properties.append({
+                "id": str(uuid.uuid4()),
+                "user_id": random.choice(users)["id"],
+                "title": f"Seed Property {i}",
+                "description": "Seeded for the query-plan suite",
+                "property_type": random.choice(PROPERTY_TYPES),
+                "rent": random.randrange(2000, 60000, 500),
+                "deposit": 10000,
+                "location": f"Sector {i % 90}",
+                "city": city,
+                "city_key": server.normalize_city(city),
+                "images": [],
+                "amenities": ["wifi"],
+                "available": random.random() < 0.8,
+                "created_at": now - timedelta(minutes=i),
+                "updated_at": now
+            })
+        self.sync_db.properties.insert_many(properties)
+
+    def seed_conversations(self, user_id: str):
+        """Long, mostly read threads between `user_id` and seeded users"""
+        properties = list(self.sync_db.properties.find({}, {"_id": 0, "id": 1, "user_id": 1}).limit(SEED_CONVERSATIONS))
+        started = datetime.utcnow() - timedelta(days=30)
+        chats, conversations = [], []
+        for property_doc in properties:
+            other = property_doc["user_id"]
+            count = SEED_MESSAGES_PER_CONVERSATION
+            for seq in range(1, count + 1):
+                sender, receiver = (other, user_id) if seq % 2 else (user_id, other)
+                chats.append({
+                    "id": str(uuid.uuid4()),
+                    "property_id": property_doc["id"],
+                    "sender_id": sender,
+                    "receiver_id": receiver,
+                    "message": f"Seeded message {seq}",
+                    # Only the last few incoming messages are still unread
+                    "is_read": seq < count - 4,
+                    "read_at": None,
+                    "created_at": started + timedelta(minutes=seq),
+                    "seq": seq
+                })
+            last = chats[-1]
+            conversations.append({
+                "id": server.conversation_key(property_doc["id"], user_id, other),
+                "property_id": property_doc["id"],
+                "participants": sorted([user_id, other]),
+                "last_message": last["message"],
+                "last_message_time": last["created_at"],
+                "last_sender_id": last["sender_id"],
+                "last_seq": count,
+                "unread": {user_id: sum(1 for c in chats[-5:] if c["receiver_id"] == user_id and not c["is_read"]), other: 0}
+            })
+        self.sync_db.chats.insert_many(chats)
+        self.sync_db.conversations.insert_many(conversations)
+        self.sync_db.unread_counters.update_one(
+            {"user_id": user_id},
+            {"$set": {"unread_count": sum(c["unread"][user_id] for c in conversations)}},
+            upsert=True
+        )
+        return properties[0]["id"], properties[0]["user_id"]
+
+    async def check(self, name: str, method: str, path: str, **kwargs) -> httpx.Response:
+        """Call a route and check the plan of every query it issued"""
+        self.recorder.commands = []
+        response = await self.http.request(method, path, **kwargs)
+        route = self.match_route(method, path)
+        if route:
+            self.covered_routes.add(route)
+        if response.status_code >= 400:
+            self.log_result(f"{name} (request)", False, f"{method} {path} -> HTTP {response.status_code}")
+            return response
+
+        problems = []
+        for command in self.recorder.commands:
+            for statement in explainable(command):
+                explain = self.sync_db.command({"explain": statement, "verbosity": "executionStats"})
+                stages = plan_stages(explain)
+                examined, returned = examined_and_returned(execution_stats(explain))
+                label = next(iter(statement))
+                if "COLLSCAN" in stages:
+                    problems.append(f"{label} on {statement[label]}: COLLSCAN")
+                if "SORT" in stages:
+                    problems.append(f"{label} on {statement[label]}: in-memory SORT")
+                if examined > max(returned, 1) * MAX_EXAMINED_RATIO:
+                    problems.append(f"{label} on {statement[label]}: examined {examined} for {returned} returned")
+
+        if name in KNOWN_SLOW:
+            print(f"⚠️  KNOWN: {name} ({KNOWN_SLOW[name]}): {problems or 'now passes, remove it from KNOWN_SLOW'}")
+        else:
+            self.log_result(name, not problems, "; ".join(problems) or f"{len(self.recorder.commands)} queries checked")
+        return response
+
+    def match_route(self, method: str, path: str):
+        path = path.split("?")[0]
+        for route in server.api_router.routes:
+            if method in getattr(route, "methods", ()) and route.path_regex.match(path):
+                return (method, route.path)
+        return None
+
+    async def register(self, label: str) -> None:
+        timestamp = str(int(time.time() * 1000))
+        response = await self.check(f"register {label}", "POST", "/api/auth/register", json={
+            "email": f"plans.{label}.{timestamp}@example.com",
+            "name": f"Plans {label.title()}",
+            "phone": f"5{timestamp[-9:]}",
+            "password": "planspass123"
+        })
+        data = response.json()
+        self.tokens[label] = data["access_token"]
+        self.user_ids[label] = data["user"]["id"]
+        login = await self.check(f"login {label}", "POST", "/api/auth/login", json={
+            "email": data["user"]["email"],
+            "password": "planspass123"
+        })
+        # A second session, ended straight away, covers rotation and revocation
+        refreshed = await self.check(f"refresh {label}", "POST", "/api/auth/refresh",
+                                     json={"refresh_token": login.json()["refresh_token"]})
+        await self.check(f"logout {label}", "POST", "/api/auth/logout",
+                         headers={"Authorization": f"Bearer {refreshed.json()['access_token']}"})
+
+    async def drive_routes(self):
+        print("\n=== Driving every route ===")
+        await self.check("health", "GET", "/api/")
+        await self.check("metrics", "GET", "/api/metrics")
+        await self.register("landlord")
+        await self.register("tenant")
+        await self.check("current user", "GET", "/api/auth/me", headers=self.auth("tenant"))
+        seeded_property, seeded_owner = self.seed_conversations(self.user_ids["tenant"])
+
+        response = await self.check("create property", "POST", "/api/properties", headers=self.auth("landlord"), json={
+            "title": "Query Plan Room",
+            "description": "Room created by the query-plan suite",
+            "property_type": "room",
+            "rent": 8000,
+            "deposit": 16000,
+            "location": "Plan Street",
+            "city": "Pune",
+            "images": [TINY_JPEG],
+            "amenities": []
+        })
+        self.property_id = response.json()["id"]
+        await self.check("get image", "GET", response.json()["images"][0])
+        await self.check("get image thumbnail", "GET", response.json()["images"][0], params={"size": "thumb"})
+        uploaded = await self.check("upload images", "POST", f"/api/properties/{self.property_id}/images", headers=self.auth("landlord"),
+                                    params={"position": 0}, files={"images": ("room.jpg", b"\xff\xd8\xff" + os.urandom(64), "image/jpeg")})
+        image_path = f"/api/properties/{self.property_id}/images/{uploaded.json()[0].rsplit('/', 1)[1]}"
+        await self.check("move image", "PATCH", image_path, headers=self.auth("landlord"), json={"position": 1})
+        await self.check("delete image", "DELETE", image_path, headers=self.auth("landlord"))
+        await self.check("list properties", "GET", "/api/properties")
+        await self.check("list properties by type and rent", "GET", "/api/properties",
+                         params={"property_type": "pg", "min_rent": 5000, "max_rent": 40000})
+        # Keyset pages cost the same however deep they are
+        cursor = None
+        for _ in range(DEEP_PAGE - 1):
+            page = await self.http.get("/api/properties", params={"city": "Mumbai", **({"cursor": cursor} if cursor else {})})
+            cursor = page.headers["X-Next-Cursor"]
+        await self.check(f"list properties page {DEEP_PAGE}", "GET", "/api/properties", params={"city": "Mumbai", "cursor": cursor})
+        await self.check("list properties by city", "GET", "/api/properties", params={"city": "pune"})
+        await self.check("list properties by city prefix", "GET", "/api/properties",
+                         params={"city": "Hyd", "city_match": "prefix", "property_type": "room"})
+        await self.check("get property", "GET", f"/api/properties/{self.property_id}")
+        await self.check("update property", "PUT", f"/api/properties/{self.property_id}",
+                         headers=self.auth("landlord"), json={"rent": 8500})
+        await self.check("my properties", "GET", "/api/my-properties", headers=self.auth("landlord"))
+
+        sent = await self.check("send message", "POST", "/api/chat", headers=self.auth("tenant"), json={
+            "property_id": self.property_id,
+            "receiver_id": self.user_ids["landlord"],
+            "message": "Is this room still available?"
+        })
+        await self.check("conversations", "GET", "/api/chat/conversations", headers=self.auth("tenant"))
+        await self.check("unread count", "GET", "/api/chat/unread-count", headers=self.auth("landlord"))
+
+        history = f"/api/chat/{seeded_property}"
+        page = await self.check("chat history newest page", "GET", history, headers=self.auth("tenant"),
+                                params={"other_user_id": seeded_owner, "limit": 50})
+        await self.check("chat history older page", "GET", history, headers=self.auth("tenant"),
+                         params={"other_user_id": seeded_owner, "limit": 50, "before": page.headers["X-Before-Cursor"]})
+        await self.check("chat history newer page", "GET", history, headers=self.auth("tenant"),
+                         params={"other_user_id": seeded_owner, "after": page.headers["X-After-Cursor"]})
+        await self.check("chat history after_seq", "GET", history, headers=self.auth("tenant"),
+                         params={"other_user_id": seeded_owner, "after_seq": SEED_MESSAGES_PER_CONVERSATION - 10})
+        await self.check("long poll", "GET", f"{history}/poll", headers=self.auth("tenant"),
+                         params={"other_user_id": seeded_owner, "after_seq": SEED_MESSAGES_PER_CONVERSATION, "timeout": 0})
+
+        await self.check("mark read by ids", "POST", "/api/chat/mark-read", headers=self.auth("landlord"),
+                         json={"message_ids": [sent.json()["id"]]})
+        await self.check("mark conversation read", "POST", "/api/chat/conversations/mark-read", headers=self.auth("tenant"),
+                         json={"property_id": seeded_property, "other_user_id": seeded_owner,
+                               "up_to_seq": SEED_MESSAGES_PER_CONVERSATION})
+        await self.check("delete property", "DELETE", f"/api/properties/{self.property_id}", headers=self.auth("landlord"))
+
+    def test_route_coverage(self):
+        declared = {
+            (method, route.path)
+            for route in server.api_router.routes
+            for method in getattr(route, "methods", None) or ["WEBSOCKET"]
+            if route.path not in STREAM_ROUTES
+        }
+        uncovered = sorted(f"{method} {path}" for method, path in declared - self.covered_routes)
+        self.log_result("Every Route Driven", not uncovered, f"No scenario for: {', '.join(uncovered)}" if uncovered else "")
+
+    async def run(self):
+        # Point the app at the scratch database through a monitored client
+        server.client = AsyncIOMotorClient(MONGO_URL, event_listeners=[self.recorder])
+        server.db = server.client[TEST_DB]
+        await server.create_indexes()
+        await server.chat_broker.start(server.dispatch_broker_message)
+        self.seed()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://plans") as http:
+            self.http = http
+            await self.drive_routes()
+        self.test_route_coverage()
+        server.client.close()
+
+    def run_all_tests(self):
+        print("🚀 Starting Query-Plan Regression Suite")
+        print(f"📍 Scratch database: {TEST_DB} on {MONGO_URL}")
+        print("=" * 70)
+        self.sync_db.client.drop_database(TEST_DB)
+        try:
+            asyncio.run(self.run())
+        finally:
+            self.sync_db.client.drop_database(TEST_DB)
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = QueryPlanTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for registration
+Fires 1,000 simultaneous registrations, half sharing one email and half sharing one phone number,
+and checks that exactly one of each group is created and every other one gets the duplicate message
+"""
+
+import asyncio
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+
+REGISTRATIONS = 1_000
+# Every registration hashes its password before the insert, so the burst takes a while to drain
+TIMEOUT_SECONDS = 600
+
+def outcome(response: httpx.Response):
+    if response.status_code == 200:
+        return "created"
+    if response.headers.get("content-type") == "application/json":
+        return response.json().get("detail", response.status_code)
+    return response.status_code
+
+class RegistrationRaceTest:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.results = {
+            "passed": 0,
+            "failed": 0,
+            "errors": []
+        }
+
+    def log_result(self, test_name: str, success: bool, message: str = ""):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status}: {test_name}")
+        if message:
+            print(f"   {message}")
+
+        if success:
+            self.results["passed"] += 1
+        else:
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{test_name}: {message}")
+
+    def registrations(self) -> tuple:
+        """Two groups of payloads: one sharing an email, one sharing a phone number"""
+        timestamp = str(int(time.time() * 1000))
+        half = REGISTRATIONS // 2
+        same_email = [{
+            "email": f"race.{timestamp}@example.com",
+            "name": "Race User",
+            "phone": f"5{timestamp[-6:]}{i:03d}",
+            "password": "racetestpass123"
+        } for i in range(half)]
+        # Formatted differently each time: duplicates are detected on the normalized digits
+        same_phone = [{
+            "email": f"race.{timestamp}.{i}@example.com",
+            "name": "Race User",
+            "phone": f"+6 {timestamp[-9:]}" if i % 2 else f"6{timestamp[-9:]}",
+            "password": "racetestpass123"
+        } for i in range(REGISTRATIONS - half)]
+        return same_email, same_phone
+
+    def check_group(self, label: str, responses: list, duplicate_message: str):
+        outcomes = Counter(outcome(response) for response in responses)
+        self.log_result(
+            f"Exactly One {label} Registration Created",
+            outcomes["created"] == 1,
+            f"Outcomes: {dict(outcomes)}"
+        )
+        self.log_result(
+            f"Every Other {label} Registration Rejected As Duplicate",
+            outcomes[duplicate_message] == len(responses) - 1,
+            f"Outcomes: {dict(outcomes)}"
+        )
+
+    async def run(self):
+        same_email, same_phone = self.registrations()
+        limits = httpx.Limits(max_connections=REGISTRATIONS)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=TIMEOUT_SECONDS) as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(client.post("/auth/register", json=payload) for payload in same_email + same_phone))
+            print(f"   {REGISTRATIONS} registrations answered in {time.perf_counter() - start:.1f}s")
+
+            self.log_result(
+                "No Server Errors",
+                all(response.status_code < 500 for response in responses),
+                f"Statuses: {dict(Counter(response.status_code for response in responses))}"
+            )
+            self.check_group("Same-Email", responses[:len(same_email)], "Email already registered")
+            self.check_group("Same-Phone", responses[len(same_email):], "Phone number already registered")
+
+            winner = next((payload for payload, response in zip(same_email, responses) if response.status_code == 200), None)
+            if winner:
+                response = await client.post("/auth/login", json={"email": winner["email"], "password": winner["password"]})
+                self.log_result("Created User Can Log In", response.status_code == 200, f"HTTP {response.status_code}")
+
+    def run_all_tests(self):
+        print("🚀 Starting Registration Race Test")
+        print(f"📍 Testing against: {self.base_url}")
+        print("=" * 70)
+        asyncio.run(self.run())
+
+        print("\n" + "=" * 70)
+        print("🏁 TEST SUMMARY")
+        print("=" * 70)
+        print(f"✅ Passed: {self.results['passed']}")
+        print(f"❌ Failed: {self.results['failed']}")
+        if self.results['errors']:
+            print("\n🔍 FAILED TESTS:")
+            for error in self.results['errors']:
+                print(f"   • {error}")
+        return self.results
+
+if __name__ == "__main__":
+    tester = RegistrationRaceTest()
+    results = tester.run_all_tests()
+    sys.exit(1 if results["failed"] else 0)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Load test for the /api/ws real-time chat endpoint
+Holds 10k idle sockets open and measures message fan-out latency to a landlord's connections
+"""
+
+import asyncio
+import json
+import resource
+import statistics
+import time
+from typing import Dict, List
+
+import requests
+import websockets
+
+# Configuration - Backend runs on port 8001 internally
+BASE_URL = "http://localhost:8001/api"
+WS_URL = "ws://localhost:8001/api/ws"
+HEADERS = {"Content-Type": "application/json"}
+
+IDLE_SOCKETS = 10_000
+LISTENER_SOCKETS = 100
+MESSAGES = 50
+CONNECT_CONCURRENCY = 200
+MAX_P99_FANOUT_MS = 250
+
+class WebSocketLoadTest:
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.headers = HEADERS.copy()
+        self.tokens: Dict[str, str] = {}
+        self.user_ids: Dict[str, str] = {}
+        self.property_id = None
+        self.sent_at: Dict[str, float] = {}
+        self.latencies: List[float] = []
+
+    def register(self, label: str):
+        timestamp = str(int(time.time() * 1000))
+        user_data = {
+            "email": f"ws.{label}.{timestamp}@example.com",
+            "name": f"WS {label.title()}",
+            "phone": f"8{timestamp[-9:]}",
+            "password": "wsloadpass123"
+        }
+        response = requests.post(f"{self.base_url}/auth/register", headers=self.headers, json=user_data)
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not register {label}: {response.text}")
+        data = response.json()
+        self.tokens[label] = data["access_token"]
+        self.user_ids[label] = data["user"]["id"]
+        time.sleep(0.01)
+
+    def setup(self):
+        print("\n=== Registering load test users ===")
+        for label in ("idle", "landlord", "tenant"):
+            self.register(label)
+        property_data = {
+            "title": "WebSocket Load Test Room",
+            "description": "Room created by the WebSocket load test",
+            "property_type": "room",
+            "rent": 5000,
+            "deposit": 10000,
+            "location": "Load Street",
+            "city": "Load City",
+            "images": [],
+            "amenities": []
+        }
+        headers = {**self.headers, "Authorization": f"Bearer {self.tokens['landlord']}"}
+        response = requests.post(f"{self.base_url}/properties", headers=headers, json=property_data)
+        self.property_id = response.json()["id"]
+
+    async def open_sockets(self, label: str, count: int) -> list:
+        semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+        async def connect():
+            async with semaphore:
+                return await websockets.connect(f"{WS_URL}?token={self.tokens[label]}", ping_interval=None)
+
+        return await asyncio.gather(*(connect() for _ in range(count)))
+
+    async def listen(self, socket):
+        async for raw in socket:
+            event = json.loads(raw)
+            if event["type"] == "message" and event["message"]["message"] in self.sent_at:
+                sent = self.sent_at[event["message"]["message"]]
+                self.latencies.append((time.perf_counter() - sent) * 1000)
+
+    async def send_messages(self):
+        loop = asyncio.get_running_loop()
+        headers = {**self.headers, "Authorization": f"Bearer {self.tokens['tenant']}"}
+        for i in range(MESSAGES):
+            text = f"load-test-{i}-{time.time()}"
+            self.sent_at[text] = time.perf_counter()
+            await loop.run_in_executor(None, lambda: requests.post(f"{self.base_url}/chat", headers=headers, json={
+                "property_id": self.property_id,
+                "receiver_id": self.user_ids["landlord"],
+                "message": text
+            }))
+            await asyncio.sleep(0.05)
+        # Let the last fan-out drain
+        await asyncio.sleep(1)
+
+    async def run(self) -> bool:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        needed = IDLE_SOCKETS + LISTENER_SOCKETS + 1024
+        if soft < needed:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+        print(f"\n=== Opening {IDLE_SOCKETS} idle sockets ===")
+        start = time.perf_counter()
+        idle = await self.open_sockets("idle", IDLE_SOCKETS)
+        print(f"   Opened in {time.perf_counter() - start:.1f} s")
+
+        print(f"\n=== Opening {LISTENER_SOCKETS} listener sockets and sending {MESSAGES} messages ===")
+        listeners = await self.open_sockets("landlord", LISTENER_SOCKETS)
+        listen_tasks = [asyncio.create_task(self.listen(socket)) for socket in listeners]
+        await self.send_messages()
+
+        for task in listen_tasks:
+            task.cancel()
+        await asyncio.gather(*(socket.close() for socket in idle + listeners), return_exceptions=True)
+
+        expected = MESSAGES * LISTENER_SOCKETS
+        delivered = len(self.latencies)
+        ordered = sorted(self.latencies)
+        p50 = statistics.median(ordered) if ordered else float("inf")
+        p99 = ordered[int(len(ordered) * 0.99) - 1] if ordered else float("inf")
+
+        print("\n" + "=" * 70)
+        print("🏁 LOAD TEST SUMMARY")
+        print("=" * 70)
+        print(f"📊 Delivered {delivered}/{expected} events with {IDLE_SOCKETS} idle sockets open")
+        print(f"📊 Fan-out latency p50 {p50:.1f} ms   p99 {p99:.1f} ms")
+        passed = delivered == expected and p99 <= MAX_P99_FANOUT_MS
+        if passed:
+            print(f"✅ PASS: every event delivered, p99 <= {MAX_P99_FANOUT_MS} ms")
+        else:
+            print(f"❌ FAIL: expected all events with p99 <= {MAX_P99_FANOUT_MS} ms")
+        return passed
+
+    def run_load_test(self) -> bool:
+        print("🚀 Starting WebSocket Load Test")
+        print(f"📍 Testing against: {WS_URL}")
+        print("=" * 70)
+        self.setup()
+        try:
+            return asyncio.run(self.run())
+        finally:
+            headers = {**self.headers, "Authorization": f"Bearer {self.tokens['landlord']}"}
+            requests.delete(f"{self.base_url}/properties/{self.property_id}", headers=headers)
+
+if __name__ == "__main__":
+    tester = WebSocketLoadTest()
+    tester.run_load_test()